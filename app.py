@@ -2,9 +2,9 @@
 
 import src.ssl_config  # noqa: F401  — must be first to patch SSL globally
 
-import json
 import os
 import time
+import uuid
 
 import plotly.graph_objects as go
 import streamlit as st
@@ -13,7 +13,16 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from src.data.products import INITIAL_PROMPTS, SAMPLE_PRODUCTS  # noqa: E402
+from src.checkpoint import get_checkpointer, run_config  # noqa: E402
+from src.data.store import register_products  # noqa: E402
 from src.graph import build_graph  # noqa: E402
+from src.history_store import HistoryStore  # noqa: E402
+
+# Full iteration snapshots shown per page in the Results tab
+HISTORY_PAGE_SIZE = 5
+
+MODEL_OPTIONS = ["gpt-4o-mini", "gpt-4o", "gpt-4.1-mini", "gpt-4.1-nano"]
+SAME_MODEL = "(mesmo do enriquecimento)"
 
 # ---------------------------------------------------------------------------
 # Page config
@@ -76,10 +85,35 @@ with st.sidebar:
 
     model_name = st.selectbox(
         "Modelo",
-        ["gpt-4o-mini", "gpt-4o", "gpt-4.1-mini", "gpt-4.1-nano"],
+        MODEL_OPTIONS,
         index=0,
+        help="Modelo que gera o enriquecimento",
     )
 
+    with st.expander("Modelos por etapa"):
+        judge_model = st.selectbox(
+            "Juiz (metricas)", [SAME_MODEL] + MODEL_OPTIONS, index=0
+        )
+        feedback_model = st.selectbox(
+            "Feedback simulado", [SAME_MODEL] + MODEL_OPTIONS, index=0
+        )
+        suggester_model = st.selectbox(
+            "Sugestor", [SAME_MODEL] + MODEL_OPTIONS, index=0
+        )
+
+    with st.expander("Comparacao de modelos"):
+        compare_models = st.checkbox(
+            "Comparar modelos de enriquecimento",
+            value=False,
+            help="Avalia os prompts iniciais com cada modelo em paralelo e "
+            "escolhe o mais barato que atinge o score alvo",
+        )
+        comparison_models = st.multiselect(
+            "Modelos comparados",
+            options=MODEL_OPTIONS,
+            default=MODEL_OPTIONS,
+        )
+
     max_iterations = st.slider(
         "Iteracoes de otimizacao",
         min_value=1,
@@ -88,6 +122,180 @@ with st.sidebar:
         help="Quantas vezes o ciclo avaliacao->feedback->sugestao->execucao roda",
     )
 
+    max_concurrency = st.slider(
+        "Chamadas simultaneas",
+        min_value=1,
+        max_value=16,
+        value=4,
+        help="Maximo de chamadas ao LLM em paralelo (avaliacao e feedback)",
+    )
+
+    feedback_timeout = st.number_input(
+        "Timeout do feedback (s)",
+        min_value=5,
+        max_value=300,
+        value=60,
+        help="Tempo maximo de cada revisao do usuario simulado",
+    )
+
+    use_cache = st.checkbox(
+        "Usar cache de respostas e julgamentos",
+        value=True,
+        help="Reaproveita outputs e notas do juiz ja gerados para o mesmo modelo e prompt",
+    )
+
+    pipelined = st.checkbox(
+        "Pipeline avaliacao -> feedback",
+        value=False,
+        help="Inicia o feedback de cada par assim que sua avaliacao termina",
+    )
+
+    enrichment_batch_size = st.number_input(
+        "Produtos por chamada de enriquecimento",
+        min_value=1,
+        max_value=20,
+        value=1,
+        help="Agrupa varios produtos numa unica chamada ao LLM (1 desativa)",
+    )
+
+    combined_judge = st.checkbox(
+        "Juiz combinado (1 chamada por par)",
+        value=False,
+        help="Avalia Completude, Precisao e Formato numa unica chamada ao "
+        "juiz em vez de tres metricas GEval separadas",
+    )
+
+    local_gate_threshold = st.slider(
+        "Limiar do pre-filtro local",
+        min_value=0.0,
+        max_value=1.0,
+        value=0.0,
+        step=0.05,
+        help="Outputs com score local (JSON valido, chaves esperadas, "
+        "snake_case) abaixo deste valor nao passam pelo juiz LLM "
+        "(0 desativa)",
+    )
+
+    with st.expander("Corrida de prompts (successive halving)"):
+        racing = st.checkbox(
+            "Ativar corrida",
+            value=False,
+            help="Avalia todos os prompts numa amostra de produtos e so "
+            "os melhores seguem para o conjunto completo",
+        )
+        racing_sample_size = st.number_input(
+            "Amostra inicial de produtos",
+            min_value=1,
+            max_value=100,
+            value=2,
+        )
+        racing_eta = st.number_input(
+            "Fator de eliminacao",
+            min_value=2,
+            max_value=8,
+            value=2,
+            help="A cada rodada mantem 1/fator dos prompts e multiplica "
+            "a amostra pelo fator",
+        )
+
+    suggester_context_tokens = st.number_input(
+        "Orcamento de contexto do sugestor (tokens)",
+        min_value=0,
+        value=6000,
+        step=500,
+        help="Resume avaliacoes e feedback por prompt e por atributo "
+        "dentro deste limite (0 envia o contexto completo)",
+    )
+
+    parse_retries = st.number_input(
+        "Novas tentativas de parse",
+        min_value=0,
+        max_value=3,
+        value=1,
+        help="Repete a chamada de feedback ou do sugestor cuja resposta "
+        "nao segue o schema, mesmo apos o reparo local",
+    )
+
+    with st.expander("Busca evolutiva de prompts"):
+        population_size = st.number_input(
+            "Tamanho da populacao",
+            min_value=0,
+            max_value=32,
+            value=0,
+            help="Prompts gerados por iteracao a partir dos melhores "
+            "(0 usa o sugestor padrao, com 2 sugestoes)",
+        )
+        population_parents = st.number_input(
+            "Pais (top-k)", min_value=1, max_value=8, value=2
+        )
+        population_calls = st.number_input(
+            "Chamadas simultaneas do sugestor",
+            min_value=1,
+            max_value=8,
+            value=4,
+            help="Cada chamada usa uma temperatura diferente",
+        )
+
+    admission_threshold = st.slider(
+        "Limiar de duplicata",
+        min_value=0.0,
+        max_value=1.0,
+        value=0.8,
+        step=0.05,
+        help="Sugestoes com similaridade (MinHash) a um prompt ja testado "
+        "a partir deste valor nao sao avaliadas (0 desativa)",
+    )
+
+    elite_size = st.number_input(
+        "Elite (melhores prompts mantidos)",
+        min_value=0,
+        max_value=5,
+        value=0,
+        help="Os melhores prompts seguem para a proxima iteracao e so "
+        "sao avaliados em produtos que ainda nao viram (0 desativa)",
+    )
+
+    with st.expander("Criterios de parada"):
+        target_score = st.slider(
+            "Score alvo",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.0,
+            step=0.05,
+            help="Encerra ao atingir este score (0 desativa)",
+        )
+        min_delta = st.number_input(
+            "Melhoria minima",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.0,
+            step=0.01,
+            help="Encerra se o melhor score melhorar menos que isso "
+            "nas ultimas N iteracoes (0 desativa)",
+        )
+        patience = st.number_input(
+            "Iteracoes sem melhoria (N)",
+            min_value=1,
+            max_value=10,
+            value=2,
+        )
+        token_budget = st.number_input(
+            "Orcamento de tokens",
+            min_value=0,
+            value=0,
+            step=10_000,
+            help="Encerra ao consumir este total de tokens (0 desativa)",
+        )
+
+    history_retention = st.slider(
+        "Iteracoes completas em memoria",
+        min_value=1,
+        max_value=10,
+        value=3,
+        help="Iteracoes mais antigas ficam so com os agregados no estado; "
+        "o historico completo e gravado em disco",
+    )
+
     st.divider()
     st.subheader("Produtos de teste")
     selected_products = st.multiselect(
@@ -96,6 +304,46 @@ with st.sidebar:
         default=[p["name"] for p in SAMPLE_PRODUCTS],
     )
 
+    with st.expander("Catalogo externo"):
+        catalog_path = st.text_input(
+            "Arquivo do catalogo",
+            value="",
+            help="JSONL, CSV ou Parquet. Quando informado, substitui os "
+            "produtos de exemplo e e lido sob demanda",
+        )
+        catalog_sample_size = st.number_input(
+            "Amostra estratificada por categoria",
+            min_value=0,
+            value=0,
+            help="Quantidade de produtos sorteados (0 usa todos)",
+        )
+        catalog_shard_count = st.number_input(
+            "Numero de shards", min_value=1, value=1
+        )
+        catalog_shard_index = st.number_input(
+            "Shard atual",
+            min_value=0,
+            max_value=int(catalog_shard_count) - 1,
+            value=0,
+        )
+
+    if pipelined:
+        ignored = [
+            label
+            for label, enabled in (
+                ("produtos por chamada", enrichment_batch_size > 1),
+                ("corrida de prompts", racing),
+                ("leitura sob demanda do catalogo", bool(catalog_path)),
+            )
+            if enabled
+        ]
+        if ignored:
+            st.warning(
+                "O modo pipeline nao suporta: " + ", ".join(ignored)
+                + ". Todos os pares sao avaliados um a um e o catalogo e "
+                "carregado inteiro na memoria."
+            )
+
     st.divider()
     st.markdown(
         "**Fluxo do grafo**\n\n"
@@ -104,6 +352,7 @@ with st.sidebar:
         "  |-> Agente 1: Avaliador\n"
         "  |-> Agente 4: Feedback\n"
         "  |-> Agente 2: Sugestor\n"
+        "  |-> Admissao de candidatos\n"
         "  |-> Agente 3: Executor\n"
         "  |-> (loop ou END)\n"
         "```"
@@ -213,6 +462,22 @@ def _render_evaluation_results(results: list) -> None:
             st.divider()
 
 
+def _render_feedback_results(fb_results: list) -> None:
+    """Render simulated feedback counts per prompt x product."""
+    for fb in fb_results:
+        pos = fb.get("positivos", 0)
+        neg = fb.get("negativos", 0)
+        st.markdown(
+            f"**{fb['prompt_name']}** x "
+            f"**{fb['product_name']}**: "
+            f"<span style='color:#28a745'>"
+            f"+{pos}</span> / "
+            f"<span style='color:#dc3545'>"
+            f"-{neg}</span>",
+            unsafe_allow_html=True,
+        )
+
+
 def _render_suggestions(suggestions: list) -> None:
     """Render prompt suggestions with rationale."""
     for s in suggestions:
@@ -222,23 +487,38 @@ def _render_suggestions(suggestions: list) -> None:
             st.code(s.get("template", ""), language="text")
 
 
-def _build_comparison_chart(history: list) -> go.Figure:
+def _render_model_summary(summary: dict) -> None:
+    """Render one model's comparison summary as metric boxes."""
+    cost = summary.get("cost_usd")
+    cols = st.columns(3)
+    with cols[0]:
+        st.metric("Melhor score", f"{summary['best_score']:.2f}")
+    with cols[1]:
+        st.metric(
+            "Tokens (in / out)",
+            f"{summary['input_tokens']} / {summary['output_tokens']}",
+        )
+    with cols[2]:
+        st.metric(
+            "Custo estimado",
+            f"US$ {cost:.4f}" if cost is not None else "n/d",
+        )
+    st.caption(f"Melhor prompt: {summary.get('best_prompt', '')}")
+
+
+def _build_comparison_chart(summaries: list) -> go.Figure:
     """Build a Plotly chart comparing prompt scores across iterations."""
     fig = go.Figure()
 
-    for entry in history:
-        iteration = entry["iteration"]
-        # Group by prompt
-        prompt_scores: dict[str, list[float]] = {}
-        for ev in entry["evaluations"]:
-            pid = ev["prompt_name"]
-            prompt_scores.setdefault(pid, []).append(ev["avg_score"])
-
-        for prompt_name, scores in prompt_scores.items():
-            avg = sum(scores) / len(scores) if scores else 0
+    for summary in summaries:
+        iteration = summary["iteration"]
+        for ps in summary["prompt_summaries"]:
+            if ps["avg_score"] is None:
+                continue
+            avg = ps["avg_score"]
             fig.add_trace(
                 go.Bar(
-                    name=f"Iter {iteration}: {prompt_name}",
+                    name=f"Iter {iteration}: {ps['name']}",
                     x=[f"Iteracao {iteration}"],
                     y=[avg],
                     text=[f"{avg:.2f}"],
@@ -256,36 +536,19 @@ def _build_comparison_chart(history: list) -> go.Figure:
     return fig
 
 
-def _build_metrics_radar(history: list) -> go.Figure:
+def _build_metrics_radar(summaries: list) -> go.Figure:
     """Build a radar chart for the latest iteration's metric breakdown."""
-    if not history:
+    if not summaries:
         return go.Figure()
 
-    latest = history[-1]
-    evaluations = latest["evaluations"]
+    latest = summaries[-1]
 
     fig = go.Figure()
 
-    # Group by prompt
-    prompt_groups: dict[str, list] = {}
-    for ev in evaluations:
-        prompt_groups.setdefault(ev["prompt_name"], []).append(ev)
-
-    for prompt_name, evals in prompt_groups.items():
-        # Average each metric across products
-        metric_names: list[str] = []
-        metric_avgs: list[float] = []
-        if evals and evals[0].get("metrics"):
-            for m_name in evals[0]["metrics"]:
-                metric_names.append(m_name)
-                vals = [
-                    e["metrics"][m_name]["score"]
-                    for e in evals
-                    if m_name in e.get("metrics", {})
-                ]
-                metric_avgs.append(
-                    sum(vals) / len(vals) if vals else 0
-                )
+    for ps in latest["prompt_summaries"]:
+        prompt_name = ps["name"]
+        metric_names = list(ps["metrics"])
+        metric_avgs = list(ps["metrics"].values())
 
         fig.add_trace(
             go.Scatterpolar(
@@ -320,32 +583,134 @@ with tab_run:
         use_container_width=True,
     )
 
-    if run_button and api_key:
-        os.environ["OPENAI_API_KEY"] = api_key
-
-        products = [
-            p for p in SAMPLE_PRODUCTS if p["name"] in selected_products
-        ]
-        if not products:
-            st.error("Selecione ao menos um produto na barra lateral.")
-            st.stop()
-
-        initial_state = {
-            "products": products,
-            "current_prompts": INITIAL_PROMPTS,
-            "evaluation_results": [],
-            "suggestions": [],
-            "feedback_results": [],
-            "iteration": 0,
-            "max_iterations": max_iterations,
-            "history": [],
-            "feedback_history": [],
-            "logs": [],
-            "status": "starting",
-            "model_name": model_name,
-        }
+    resume_id = st.text_input(
+        "ID da execucao para retomar",
+        value=st.session_state.get("active_run_id", ""),
+        help="Uma execucao interrompida continua a partir do ultimo "
+        "agente concluido; pares ja avaliados nao sao refeitos",
+    )
+    resume_button = st.button(
+        "Retomar Execucao",
+        disabled=not (api_key and resume_id),
+        use_container_width=True,
+    )
 
-        graph = build_graph()
+    if (run_button or resume_button) and api_key:
+        os.environ["OPENAI_API_KEY"] = api_key
+        checkpointer = get_checkpointer()
+
+        if resume_button:
+            run_id = resume_id
+            # The product store is per process; re-intern the samples so
+            # checkpointed product IDs resolve after a restart.
+            register_products(SAMPLE_PRODUCTS)
+            saved_state = (
+                build_graph(checkpointer=checkpointer)
+                .get_state(run_config(run_id))
+                .values
+            )
+            if not saved_state:
+                st.error("Nenhum checkpoint encontrado para esta execucao.")
+                st.stop()
+            pipelined = saved_state.get("pipelined", False)
+            comparison_models = saved_state.get("comparison_models", [])
+            compare_models = bool(comparison_models)
+            max_iterations = saved_state["max_iterations"]
+            history_summaries: list = [
+                entry["summary"] for entry in saved_state.get("history", [])
+            ]
+            graph_input = None
+        else:
+            catalog: dict = {}
+            if catalog_path:
+                catalog = {
+                    "path": catalog_path,
+                    "sample_size": int(catalog_sample_size),
+                    "shard_index": int(catalog_shard_index),
+                    "shard_count": int(catalog_shard_count),
+                    "seed": 0,
+                }
+                product_ids = []
+            else:
+                products = [
+                    p
+                    for p in SAMPLE_PRODUCTS
+                    if p["name"] in selected_products
+                ]
+                if not products:
+                    st.error(
+                        "Selecione ao menos um produto na barra lateral."
+                    )
+                    st.stop()
+                # State carries only IDs; the dicts live in the shared store
+                product_ids = register_products(products)
+
+            # Full iteration snapshots are spilled to .cache/history/<run_id>
+            run_id = uuid.uuid4().hex
+            initial_state = {
+                "product_ids": product_ids,
+                "products": [],
+                "catalog": catalog,
+                "current_prompts": INITIAL_PROMPTS,
+                "evaluation_results": [],
+                "suggestions": [],
+                "feedback_results": [],
+                "iteration": 0,
+                "max_iterations": max_iterations,
+                "max_concurrency": max_concurrency,
+                "use_cache": use_cache,
+                "feedback_timeout": float(feedback_timeout),
+                "run_id": run_id,
+                "history_retention": int(history_retention),
+                "history": [],
+                "feedback_history": [],
+                "logs": [],
+                "status": "starting",
+                "target_score": target_score,
+                "min_delta": min_delta,
+                "patience": int(patience),
+                "token_budget": int(token_budget),
+                "tokens_used": 0,
+                "enrichment_batch_size": int(enrichment_batch_size),
+                "combined_judge": combined_judge,
+                "local_gate_threshold": local_gate_threshold,
+                "racing": racing,
+                "racing_sample_size": int(racing_sample_size),
+                "racing_eta": int(racing_eta),
+                "pipelined": pipelined,
+                "admission_threshold": admission_threshold,
+                "elite_size": int(elite_size),
+                "leaderboard": [],
+                "suggester_context_tokens": int(suggester_context_tokens),
+                "parse_retries": int(parse_retries),
+                "population_size": int(population_size),
+                "population_parents": int(population_parents),
+                "population_calls": int(population_calls),
+                "comparison_models": (
+                    comparison_models if compare_models else []
+                ),
+                "model_results": {},
+                "selected_model": "",
+                "stop_reason": "",
+                "model_name": model_name,
+                "judge_model": "" if judge_model == SAME_MODEL else judge_model,
+                "feedback_model": (
+                    "" if feedback_model == SAME_MODEL else feedback_model
+                ),
+                "suggester_model": (
+                    "" if suggester_model == SAME_MODEL else suggester_model
+                ),
+                "stage_timings": [],
+            }
+            graph_input = initial_state
+            history_summaries = []
+
+        st.session_state["active_run_id"] = run_id
+        graph = build_graph(
+            pipelined=pipelined,
+            checkpointer=checkpointer,
+            compare_models=compare_models,
+        )
 
         # Layout: left = agent cards, right = live log
         col_agents, col_log = st.columns([3, 2])
@@ -358,12 +723,17 @@ with tab_run:
         with col_agents:
             progress_bar = st.progress(0)
             status_text = st.empty()
-        step = 0
-        total_steps = max_iterations * 4  # evaluator + feedback + suggester + runner
+        # evaluator + feedback (or pipeline) + suggester + admission + runner
+        steps_per_iteration = 4 if pipelined else 5
+        step = len(history_summaries) * steps_per_iteration
+        total_steps = max_iterations * steps_per_iteration
+        if compare_models:
+            # one evaluator branch per model + selector
+            total_steps = len(comparison_models) + 1
 
         # Containers for each iteration
         all_logs: list[str] = []
-        full_history: list = []
+        stage_timings: list = []
         last_eval_results: list = []
 
         def _append_logs(new_lines: list[str]) -> None:
@@ -396,7 +766,7 @@ with tab_run:
                         st.text(line)
 
         for event in graph.stream(
-            initial_state, stream_mode="updates"
+            graph_input, run_config(run_id), stream_mode="updates"
         ):
             for node_name, updates in event.items():
                 step += 1
@@ -405,6 +775,7 @@ with tab_run:
 
                 new_logs = updates.get("logs", [])
                 _append_logs(new_logs)
+                stage_timings.extend(updates.get("stage_timings", []))
 
                 # --- Evaluator ---
                 if node_name == "evaluator":
@@ -436,18 +807,32 @@ with tab_run:
                             "</strong></div>",
                             unsafe_allow_html=True,
                         )
-                        for fb in fb_results:
-                            pos = fb.get("positivos", 0)
-                            neg = fb.get("negativos", 0)
-                            st.markdown(
-                                f"**{fb['prompt_name']}** x "
-                                f"**{fb['product_name']}**: "
-                                f"<span style='color:#28a745'>"
-                                f"+{pos}</span> / "
-                                f"<span style='color:#dc3545'>"
-                                f"-{neg}</span>",
-                                unsafe_allow_html=True,
-                            )
+                        _render_feedback_results(fb_results)
+
+                # --- Pipeline (Evaluator + Feedback) ---
+                elif node_name == "pipeline":
+                    status_text.markdown(
+                        "**Agentes 1 e 4 — Avaliador + Feedback** "
+                        "executando em pipeline..."
+                    )
+                    eval_results = updates.get("evaluation_results", [])
+                    last_eval_results = eval_results
+                    fb_results = updates.get("feedback_results", [])
+
+                    with col_agents:
+                        st.markdown(
+                            "<div class='agent-card agent-evaluator'>"
+                            "<strong>Agente 1 — Avaliador</strong></div>",
+                            unsafe_allow_html=True,
+                        )
+                        _render_evaluation_results(eval_results)
+                        st.markdown(
+                            "<div class='agent-card agent-feedback'>"
+                            "<strong>Agente 4 — Feedback Simulado"
+                            "</strong></div>",
+                            unsafe_allow_html=True,
+                        )
+                        _render_feedback_results(fb_results)
 
                 # --- Suggester ---
                 elif node_name == "suggester":
@@ -465,13 +850,44 @@ with tab_run:
                         )
                         _render_suggestions(suggestions)
 
+                # --- Multi-model comparison ---
+                elif node_name == "model_evaluator":
+                    for model, summary in updates.get(
+                        "model_results", {}
+                    ).items():
+                        status_text.markdown(
+                            f"**Comparacao** — modelo {model} avaliado"
+                        )
+                        with col_agents:
+                            st.markdown(
+                                "<div class='agent-card agent-evaluator'>"
+                                f"<strong>Agente 1 — Avaliador</strong> "
+                                f"| {model}</div>",
+                                unsafe_allow_html=True,
+                            )
+                            _render_model_summary(summary)
+
+                elif node_name == "model_selector":
+                    selected = updates.get("selected_model", "")
+                    with col_agents:
+                        st.success(f"Modelo escolhido: **{selected}**")
+
+                # --- Admission ---
+                elif node_name == "admission":
+                    status_text.markdown(
+                        "**Admissao** filtrando sugestoes duplicadas..."
+                    )
+
                 # --- Runner ---
                 elif node_name == "runner":
                     status_text.markdown(
                         "**Agente 3 — Executor** preparando proxima iteracao..."
                     )
-                    new_history = updates.get("history", [])
-                    full_history.extend(new_history)
+                    history_summaries.extend(
+                        entry["summary"]
+                        for entry in updates.get("history", [])
+                        if not entry.get("compacted")
+                    )
 
                     iteration_num = updates.get("iteration", 0)
                     with col_agents:
@@ -482,10 +898,11 @@ with tab_run:
                             unsafe_allow_html=True,
                         )
 
-                        if iteration_num < max_iterations:
-                            st.markdown("Iniciando proxima iteracao...")
+                        stop_reason = updates.get("stop_reason", "")
+                        if stop_reason:
+                            st.markdown(f"Encerrado: {stop_reason}.")
                         else:
-                            st.markdown("Todas as iteracoes concluidas.")
+                            st.markdown("Iniciando proxima iteracao...")
 
                         st.divider()
 
@@ -493,30 +910,31 @@ with tab_run:
         status_text.markdown("**Orquestracao concluida!**")
 
         # Store results in session state for the Results tab
-        st.session_state["history"] = full_history
+        # Only the per-iteration summaries stay in the session; full
+        # snapshots are paged from the run's history file on demand.
+        st.session_state["history_summaries"] = history_summaries
+        st.session_state["run_id"] = run_id
         st.session_state["all_logs"] = all_logs
-        st.session_state["feedback_history"] = [
-            fb
-            for entry in full_history
-            for fb in entry.get("feedback", [])
-        ]
+        st.session_state["stage_timings"] = stage_timings
 
 
 # ---- Tab: Results ----------------------------------------------------------
 with tab_results:
     st.subheader("Resultados Comparativos")
 
-    history = st.session_state.get("history", [])
-    if not history:
+    summaries = st.session_state.get("history_summaries", [])
+    if not summaries:
         st.info("Execute a orquestracao primeiro para ver os resultados.")
     else:
+        history_store = HistoryStore(st.session_state["run_id"])
+
         # Charts
         col_chart1, col_chart2 = st.columns(2)
         with col_chart1:
-            fig_bar = _build_comparison_chart(history)
+            fig_bar = _build_comparison_chart(summaries)
             st.plotly_chart(fig_bar, use_container_width=True)
         with col_chart2:
-            fig_radar = _build_metrics_radar(history)
+            fig_radar = _build_metrics_radar(summaries)
             st.plotly_chart(fig_radar, use_container_width=True)
 
         # ---- Prompt Comparison Visual -----------------------------------------
@@ -524,44 +942,11 @@ with tab_results:
         st.subheader("Comparacao Visual dos Prompts")
 
         # Collect every prompt that appeared across all iterations
-        all_prompts_timeline: list[dict] = []
-        for entry in history:
-            it = entry["iteration"]
-            for p in entry.get("prompts_used", []):
-                # Average score for this prompt in this iteration
-                evals = [
-                    e
-                    for e in entry.get("evaluations", [])
-                    if e["prompt_id"] == p["id"]
-                ]
-                avg = (
-                    sum(e["avg_score"] for e in evals) / len(evals)
-                    if evals
-                    else None
-                )
-                # Per-metric averages
-                metric_avgs: dict[str, float] = {}
-                if evals and evals[0].get("metrics"):
-                    for m_name in evals[0]["metrics"]:
-                        vals = [
-                            e["metrics"][m_name]["score"]
-                            for e in evals
-                            if m_name in e.get("metrics", {})
-                        ]
-                        metric_avgs[m_name] = (
-                            sum(vals) / len(vals) if vals else 0
-                        )
-                all_prompts_timeline.append(
-                    {
-                        "iteration": it,
-                        "id": p["id"],
-                        "name": p["name"],
-                        "rationale": p.get("rationale", ""),
-                        "template": p.get("template", ""),
-                        "avg_score": avg,
-                        "metrics": metric_avgs,
-                    }
-                )
+        all_prompts_timeline: list[dict] = [
+            {"iteration": summary["iteration"], **ps}
+            for summary in summaries
+            for ps in summary["prompt_summaries"]
+        ]
 
         if all_prompts_timeline:
             # -- Score evolution line chart --
@@ -632,8 +1017,8 @@ with tab_results:
             # -- Side-by-side prompt cards --
             st.divider()
             st.subheader("Timeline de Prompts")
-            for entry in history:
-                it = entry["iteration"]
+            for summary in summaries:
+                it = summary["iteration"]
                 st.markdown(
                     f"<div class='iteration-header'>"
                     f"Iteracao {it}</div>",
@@ -678,19 +1063,32 @@ with tab_results:
         st.divider()
         st.subheader("Feedback do Usuario Simulado")
 
-        # Accumulate feedback across all iterations
-        all_feedback: list[dict] = []
-        for entry in history:
-            it_num = entry["iteration"]
-            for fb in entry.get("feedback", []):
-                fb_copy = dict(fb)
-                fb_copy["iteration"] = it_num
-                all_feedback.append(fb_copy)
+        # Feedback totals per iteration, from the summaries
+        fb_totals = {
+            summary["iteration"]: summary["feedback_totals"]
+            for summary in summaries
+        }
+        total_reviews = sum(t["avaliacoes"] for t in fb_totals.values())
 
-        if all_feedback:
+        # One page of full iteration snapshots, read lazily from disk
+        page_count = max(
+            1, -(-history_store.count() // HISTORY_PAGE_SIZE)
+        )
+        page = st.number_input(
+            "Pagina do historico detalhado",
+            min_value=1,
+            max_value=page_count,
+            value=page_count,
+            help=f"{HISTORY_PAGE_SIZE} iteracoes por pagina",
+        )
+        history_page = history_store.read_page(
+            int(page) - 1, HISTORY_PAGE_SIZE
+        )
+
+        if total_reviews:
             # Aggregate totals
-            total_pos_all = sum(fb.get("positivos", 0) for fb in all_feedback)
-            total_neg_all = sum(fb.get("negativos", 0) for fb in all_feedback)
+            total_pos_all = sum(t["positivos"] for t in fb_totals.values())
+            total_neg_all = sum(t["negativos"] for t in fb_totals.values())
             total_attrs = total_pos_all + total_neg_all
             approval_rate = (
                 total_pos_all / total_attrs * 100 if total_attrs else 0
@@ -699,7 +1097,7 @@ with tab_results:
             # KPI cards
             kpi1, kpi2, kpi3, kpi4 = st.columns(4)
             with kpi1:
-                st.metric("Total de Avaliacoes", len(all_feedback))
+                st.metric("Total de Avaliacoes", total_reviews)
             with kpi2:
                 st.metric("Reforcos Positivos", f"+{total_pos_all}")
             with kpi3:
@@ -708,12 +1106,8 @@ with tab_results:
                 st.metric("Taxa de Aprovacao", f"{approval_rate:.1f}%")
 
             # Stacked bar: positivos vs negativos per iteration
-            iter_pos: dict[int, int] = {}
-            iter_neg: dict[int, int] = {}
-            for fb in all_feedback:
-                it_n = fb["iteration"]
-                iter_pos[it_n] = iter_pos.get(it_n, 0) + fb.get("positivos", 0)
-                iter_neg[it_n] = iter_neg.get(it_n, 0) + fb.get("negativos", 0)
+            iter_pos = {i: t["positivos"] for i, t in fb_totals.items()}
+            iter_neg = {i: t["negativos"] for i, t in fb_totals.items()}
 
             iters_sorted = sorted(iter_pos.keys())
             fig_fb = go.Figure()
@@ -774,8 +1168,8 @@ with tab_results:
             )
             st.plotly_chart(fig_approval, use_container_width=True)
 
-            # Detailed feedback per iteration
-            for entry in history:
+            # Detailed feedback per iteration (current page)
+            for entry in history_page:
                 it_n = entry["iteration"]
                 fbs = entry.get("feedback", [])
                 if not fbs:
@@ -821,9 +1215,11 @@ with tab_results:
         # Detailed iteration history
         st.divider()
         st.subheader("Historico Detalhado por Iteracao")
-        for entry in history:
+        for entry in history_page:
             it = entry["iteration"]
-            with st.expander(f"Iteracao {it}", expanded=(it == len(history))):
+            with st.expander(
+                f"Iteracao {it}", expanded=(it == len(summaries))
+            ):
                 st.markdown("**Prompts utilizados:**")
                 for p in entry.get("prompts_used", []):
                     st.markdown(f"- {p['name']}: {p.get('rationale', '')}")
@@ -848,7 +1244,8 @@ with tab_results:
         prompt_best: dict[str, dict] = {}  # id -> best record
         for pt in all_prompts_timeline:
             score = pt["avg_score"]
-            if score is None:
+            # Prompts pruned by racing only have partial scores
+            if score is None or pt.get("partial"):
                 continue
             pid = pt["id"]
             if pid not in prompt_best or score > prompt_best[pid]["avg_score"]:
@@ -963,11 +1360,66 @@ with tab_results:
                         unsafe_allow_html=True,
                     )
 
-        # Export
+        # ---- Stage timings ---------------------------------------------------
+        stage_timings = st.session_state.get("stage_timings", [])
+        if stage_timings:
+            st.divider()
+            st.subheader("Latencia e Tokens por Etapa")
+            per_stage: dict[tuple, dict] = {}
+            for t in stage_timings:
+                agg = per_stage.setdefault(
+                    (t["stage"], t["model"]),
+                    {
+                        "calls": 0,
+                        "seconds": 0.0,
+                        "tokens": 0,
+                        "responses": 0,
+                        "parse_failures": 0,
+                        "fallbacks": 0,
+                    },
+                )
+                agg["calls"] += t["calls"]
+                agg["seconds"] += t["seconds"]
+                agg["tokens"] += t["tokens"]
+                agg["responses"] += t.get("responses", 0)
+                agg["parse_failures"] += t.get("parse_failures", 0)
+                agg["fallbacks"] += t.get("fallbacks", 0)
+            st.dataframe(
+                [
+                    {
+                        "Etapa": stage,
+                        "Modelo": model,
+                        "Chamadas": agg["calls"],
+                        "Latencia media (s)": round(
+                            agg["seconds"] / agg["calls"], 2
+                        )
+                        if agg["calls"]
+                        else 0.0,
+                        "Tempo total (s)": round(agg["seconds"], 1),
+                        "Tokens": agg["tokens"],
+                        "Falhas de parse (%)": round(
+                            100 * agg["parse_failures"] / agg["responses"], 1
+                        )
+                        if agg["responses"]
+                        else None,
+                        "Fallbacks": agg["fallbacks"],
+                    }
+                    for (stage, model), agg in per_stage.items()
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+
+        # Export: the spilled history is only read when requested
         st.divider()
-        st.download_button(
-            "Exportar historico (JSON)",
-            data=json.dumps(history, ensure_ascii=False, indent=2),
-            file_name="orchestration_history.json",
-            mime="application/json",
-        )
+        if not os.path.exists(history_store.path):
+            st.caption("Historico ainda nao gravado em disco.")
+        elif st.button("Preparar exportacao do historico"):
+            with open(history_store.path, encoding="utf-8") as f:
+                export_data = f.read()
+            st.download_button(
+                "Exportar historico (JSONL)",
+                data=export_data,
+                file_name="orchestration_history.jsonl",
+                mime="application/jsonl",
+            )
@@ -0,0 +1,121 @@
+"""Candidate admission: drops near-duplicate suggestions before evaluation.
+
+Runs between the suggester and the runner. Each suggested template is
+compared by MinHash similarity against every prompt already tried in the
+run (the history summaries, which survive compaction, and the current
+prompts). Candidates at or above ``admission_threshold`` are rejected;
+near-duplicates among the candidates themselves are merged into the first
+one. Only novel candidates reach the next evaluation.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from ..evaluation.similarity import minhash, similarity
+from ..state import OrchestratorState
+
+DEFAULT_ADMISSION_THRESHOLD = 0.8
+
+
+def _known_prompts(state: OrchestratorState) -> List[Dict[str, Any]]:
+    """Every prompt tried so far in the run, oldest first."""
+
+    prompts: List[Dict[str, Any]] = []
+    for entry in state.get("history", []):
+        prompts.extend(entry.get("summary", {}).get("prompt_summaries", []))
+    prompts.extend(state.get("current_prompts", []))
+    return prompts
+
+
+def _closest(
+    signature: List[int], signatures: List[Tuple[Dict[str, Any], List[int]]]
+) -> Tuple[float, Dict[str, Any]]:
+    """Highest similarity to ``signatures`` and the prompt it belongs to."""
+
+    best: Tuple[float, Dict[str, Any]] = (0.0, {})
+    for prompt, other in signatures:
+        score = similarity(signature, other)
+        if score > best[0]:
+            best = (score, prompt)
+    return best
+
+
+def admission_node(state: OrchestratorState) -> Dict[str, Any]:
+    """Admits only novel suggestions.
+
+    Suggestions that keep the id and template of a known prompt (parents
+    or elites carried forward on purpose) are admitted as they are. If
+    every candidate is rejected, the most novel one is admitted so the
+    next iteration still has a new prompt.
+
+    Returns the admitted suggestions and log entries.
+    """
+
+    threshold = state.get("admission_threshold", DEFAULT_ADMISSION_THRESHOLD)
+    suggestions = state["suggestions"]
+    if not threshold or not suggestions:
+        return {}
+
+    known = _known_prompts(state)
+    known_templates = {p["id"]: p.get("template", "") for p in known}
+    known_signatures = [(p, minhash(p.get("template", ""))) for p in known]
+
+    admitted: List[Dict[str, Any]] = []
+    admitted_signatures: List[Tuple[Dict[str, Any], List[int]]] = []
+    rejected: List[Tuple[float, Dict[str, Any]]] = []
+    carried = merged = 0
+    new_logs: list[str] = []
+
+    for candidate in suggestions:
+        template = candidate.get("template", "")
+        if known_templates.get(candidate.get("id")) == template:
+            admitted.append(candidate)
+            carried += 1
+            continue
+
+        signature = minhash(template)
+        score, match = _closest(signature, known_signatures)
+        if score >= threshold:
+            rejected.append((score, candidate))
+            new_logs.append(
+                f"   Rejeitado: {candidate.get('name', '?')} "
+                f"({score:.2f} similar a {match.get('name', '?')})"
+            )
+            continue
+
+        score, match = _closest(signature, admitted_signatures)
+        if score >= threshold:
+            match.setdefault("merged_from", []).append(
+                candidate.get("name", "?")
+            )
+            merged += 1
+            new_logs.append(
+                f"   Mesclado: {candidate.get('name', '?')} -> "
+                f"{match.get('name', '?')} ({score:.2f})"
+            )
+            continue
+
+        candidate = dict(candidate)
+        admitted.append(candidate)
+        admitted_signatures.append((candidate, signature))
+
+    if not admitted_signatures and rejected:
+        score, candidate = min(rejected, key=lambda item: item[0])
+        admitted.append(candidate)
+        rejected.remove((score, candidate))
+        new_logs.append(
+            f"   Nenhum candidato novo; admitido o menos similar: "
+            f"{candidate.get('name', '?')} ({score:.2f})"
+        )
+
+    header = [
+        "",
+        f">> Admissao de candidatos (limiar {threshold:.2f}): "
+        f"{len(admitted) - carried} novos, {len(rejected)} rejeitados, "
+        f"{merged} mesclados, {carried} mantidos",
+    ]
+
+    return {
+        "suggestions": admitted,
+        "logs": header + new_logs,
+        "status": "candidates_admitted",
+    }
@@ -0,0 +1,158 @@
+"""Multi-model comparison: one evaluator branch per enrichment model.
+
+The graph fans out one ``model_evaluator`` task per entry of
+``comparison_models`` (LangGraph ``Send``), so every model runs the same
+prompt set concurrently; each branch still keeps at most
+``max_concurrency`` calls in flight. ``model_selector`` then picks the
+cheapest model whose best prompt meets ``target_score`` (without a
+target, the best-scoring model).
+
+Branches bypass the enrichment cache: a cache hit reports no tokens, which
+would make a model that was already run look free.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..convergence import iteration_best_score
+from ..llm import estimate_cost
+from ..state import OrchestratorState
+from .evaluator import evaluator_node
+
+
+def summarize_model_run(
+    model: str, evaluation_results: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Aggregates one model's evaluation results: scores, tokens, cost."""
+
+    output_tokens = sum(r.get("output_tokens", 0) for r in evaluation_results)
+    input_tokens = sum(r["tokens"] for r in evaluation_results) - output_tokens
+
+    prompt_scores: Dict[str, List[float]] = {}
+    prompt_names: Dict[str, str] = {}
+    for r in evaluation_results:
+        if r.get("partial"):
+            continue
+        prompt_scores.setdefault(r["prompt_id"], []).append(r["avg_score"])
+        prompt_names[r["prompt_id"]] = r["prompt_name"]
+    prompt_avgs = {
+        pid: sum(scores) / len(scores) for pid, scores in prompt_scores.items()
+    }
+    best_prompt = max(prompt_avgs, key=prompt_avgs.get, default="")
+
+    return {
+        "model": model,
+        "best_score": iteration_best_score(evaluation_results),
+        "best_prompt": prompt_names.get(best_prompt, ""),
+        "prompt_scores": {
+            prompt_names[pid]: avg for pid, avg in prompt_avgs.items()
+        },
+        "pairs": len(evaluation_results),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cost_usd": estimate_cost(model, input_tokens, output_tokens),
+    }
+
+
+def select_model(
+    model_results: Dict[str, Dict[str, Any]], target_score: float
+) -> Tuple[Optional[str], str]:
+    """Picks the cheapest model that reaches ``target_score``.
+
+    Ties in cost are broken by the higher score; unpriced models count as
+    the most expensive. Without a target (0 disables it), or when no model
+    reaches it, the best-scoring model is returned, the cheaper one on a
+    tie. Returns the model (None if there are no results) and a
+    human-readable reason.
+    """
+
+    if not model_results:
+        return None, "Nenhum modelo avaliado"
+
+    def cost(summary: Dict[str, Any]) -> float:
+        value = summary.get("cost_usd")
+        return float("inf") if value is None else value
+
+    if target_score:
+        eligible = [
+            s
+            for s in model_results.values()
+            if s["best_score"] >= target_score
+        ]
+        if eligible:
+            winner = min(eligible, key=lambda s: (cost(s), -s["best_score"]))
+            return winner["model"], (
+                f"Modelo mais barato com score >= {target_score:.2f}"
+            )
+
+    winner = min(
+        model_results.values(), key=lambda s: (-s["best_score"], cost(s))
+    )
+    if not target_score:
+        return winner["model"], "Sem score alvo; escolhido o de maior score"
+    return winner["model"], (
+        f"Nenhum modelo atingiu {target_score:.2f}; escolhido o de maior score"
+    )
+
+
+def model_evaluator_node(state: OrchestratorState) -> Dict[str, Any]:
+    """Evaluates the prompt set with the branch's ``model_name``.
+
+    Runs as one ``Send`` branch per model, so it only returns keys with
+    reducers: the model's summary under ``model_results``, tokens, stage
+    timings and logs. Outputs are always generated fresh, so the summary's
+    cost reflects the model's real usage.
+    """
+
+    model = state["model_name"]
+    update = evaluator_node(state, enrichment_cache=False)
+    summary = summarize_model_run(model, update["evaluation_results"])
+
+    new_logs = ["", f"### Modelo {model}"] + update["logs"]
+    cost = summary["cost_usd"]
+    new_logs.append(
+        f"Modelo {model}: melhor score {summary['best_score']:.2f}  |  "
+        f"tokens {summary['input_tokens']} in / "
+        f"{summary['output_tokens']} out  |  "
+        + (f"custo US$ {cost:.4f}" if cost is not None else "custo n/d")
+    )
+
+    return {
+        "model_results": {model: summary},
+        "tokens_used": update["tokens_used"],
+        "stage_timings": update["stage_timings"],
+        "logs": new_logs,
+    }
+
+
+def model_selector_node(state: OrchestratorState) -> Dict[str, Any]:
+    """Ranks the compared models and selects the one to use.
+
+    Returns selected_model and a ranking log.
+    """
+
+    model_results = state.get("model_results", {})
+    target_score = state.get("target_score") or 0.0
+    selected, reason = select_model(model_results, target_score)
+
+    new_logs: list[str] = []
+    new_logs.append("")
+    new_logs.append("=" * 60)
+    new_logs.append("COMPARACAO DE MODELOS")
+    new_logs.append("=" * 60)
+    for summary in sorted(
+        model_results.values(), key=lambda s: s["best_score"], reverse=True
+    ):
+        cost = summary["cost_usd"]
+        new_logs.append(
+            f"   {summary['model']}: {summary['best_score']:.2f} "
+            f"({summary['best_prompt']})  |  "
+            + (f"US$ {cost:.4f}" if cost is not None else "custo n/d")
+        )
+    new_logs.append("")
+    new_logs.append(f"Resumo: {reason}: {selected}")
+
+    return {
+        "selected_model": selected or "",
+        "logs": new_logs,
+        "status": "comparison_complete",
+    }
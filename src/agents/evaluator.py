@@ -2,149 +2,863 @@
 
 import src.ssl_config  # noqa: F401  — ensure SSL patch is active
 
+import copy
 import json
-from typing import Any, Dict
+import math
+import random
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
-import httpx
 from deepeval.test_case import LLMTestCase
 from langchain_openai import ChatOpenAI
 
-from ..evaluation.metrics import get_evaluation_metrics
+from ..cache import DiskCache, get_cache
+from ..concurrency import run_ordered
+from ..data.catalog import iter_state_products
+from ..data.store import product_id
+from ..evaluation.attributes import score_attributes
+from ..evaluation.metrics import (
+    compute_local_metrics,
+    get_evaluation_metrics,
+    judge_tokens,
+    local_metric_results,
+    reset_judge_tokens,
+)
+from ..history_store import HistoryStore
+from ..leaderboard import elite_result, load_elite_results
+from ..llm import get_chat_model, stage_model, token_usage
 from ..state import OrchestratorState
+from ..structured_output import repair_json
+from ..timing import stage_timing, timing_log
 
+ENRICHMENT_TEMPERATURE = 0.1
+DEFAULT_RACING_SAMPLE_SIZE = 2
+DEFAULT_RACING_ETA = 2
+DEFAULT_BATCH_SIZE = 1
+STREAM_CHUNK_FACTOR = 4
 
-def evaluator_node(state: OrchestratorState) -> Dict[str, Any]:
-    """Runs each prompt x product combination, then scores with DeepEval.
+PairOutcome = Tuple[Dict[str, Any], List[str], bool]
+Usage = Tuple[int, int]  # (input tokens, output tokens)
+Generation = Tuple[str, Usage, bool, List[str]]
 
-    Returns new evaluation_results and log entries.
-    """
+BATCH_TEMPLATE = """Voce recebera {num_tasks} tarefas independentes de enriquecimento de produtos, numeradas.
+Resolva cada tarefa seguindo exatamente as instrucoes dela, sem misturar informacoes entre produtos.
 
-    model_name = state.get("model_name", "gpt-4o-mini")
-    llm = ChatOpenAI(
-        model=model_name,
-        temperature=0.1,
-        http_client=httpx.Client(verify=False),
-    )
+{tasks}
 
-    products = state["products"]
-    prompts = state["current_prompts"]
-    iteration = state.get("iteration", 0)
+Responda APENAS com um JSON valido cujas chaves sao os numeros das tarefas e cujos valores sao os objetos JSON de atributos de cada uma:
+{"1": {...}, "2": {...}}"""
 
-    new_logs: list[str] = []
-    new_logs.append("")
-    new_logs.append("=" * 60)
-    new_logs.append(
-        f"AGENTE 1 - AVALIADOR  |  Iteracao {iteration + 1}"
+
+def _build_enrichment_prompt(template: str, product: Dict[str, Any]) -> str:
+    """Renders a prompt template for a single product."""
+
+    # Use .replace() instead of .format() so that JSON curly
+    # braces in LLM-generated templates don't cause KeyErrors.
+    return (
+        template
+        .replace("{product_name}", product["name"])
+        .replace("{category}", product["category"])
+        .replace("{description}", product["description"])
+        .replace("{brand}", product["brand"])
+        .replace(
+            "{attributes}",
+            json.dumps(
+                product["attributes"],
+                ensure_ascii=False,
+                indent=2,
+            ),
+        )
     )
-    new_logs.append("=" * 60)
 
-    evaluation_results: list[Dict[str, Any]] = []
-    metrics = get_evaluation_metrics(model=model_name)
 
-    for prompt in prompts:
-        for product in products:
-            # -- 1. Build enrichment prompt from template --
-            # Use .replace() instead of .format() so that JSON curly
-            # braces in LLM-generated templates don't cause KeyErrors.
-            enrichment_prompt = (
-                prompt["template"]
-                .replace("{product_name}", product["name"])
-                .replace("{category}", product["category"])
-                .replace("{description}", product["description"])
-                .replace("{brand}", product["brand"])
-                .replace(
-                    "{attributes}",
-                    json.dumps(
-                        product["attributes"],
-                        ensure_ascii=False,
-                        indent=2,
-                    ),
-                )
-            )
+def _measure_metric(
+    shared_metric: Any, test_case: LLMTestCase
+) -> Tuple[List[Tuple[str, Dict[str, Any], str]], int]:
+    """Scores one metric, returning (name, result entry, log line) items
+    and the judge tokens the measurement spent.
 
-            new_logs.append("")
-            new_logs.append(
-                f">> {prompt['name']}  x  {product['name']}"
-            )
+    A combined judge yields one item per criterion it scores, so callers
+    always see the same per-criterion ``metric_results`` shape.
+    """
 
-            # -- 2. Call LLM for enrichment --
-            try:
-                response = llm.invoke(enrichment_prompt)
-                enriched_output = response.content
-            except Exception as e:
-                new_logs.append(f"   ERRO na geracao: {e}")
-                enriched_output = "{}"
-
-            # -- 3. Evaluate with DeepEval metrics --
-            expected = json.dumps(
-                product.get("expected_attributes", {}),
-                ensure_ascii=False,
-                indent=2,
+    # Metrics keep score/reason on the instance, so each measurement
+    # works on its own shallow copy to stay safe across threads.
+    metric = copy.copy(shared_metric)
+    reset_judge_tokens()
+    try:
+        metric.measure(test_case)
+        results = getattr(metric, "results", None) or {
+            metric.name: {"score": metric.score, "reason": metric.reason}
+        }
+        return [
+            (name, data, f"   {name}: {data['score']:.2f}")
+            for name, data in results.items()
+        ], judge_tokens()
+    except Exception as e:
+        names = getattr(metric, "criteria_names", None) or [metric.name]
+        return [
+            (
+                name,
+                {"score": 0.0, "reason": f"Erro: {e}"},
+                f"   {name}: erro - {e}",
             )
+            for name in names
+        ], judge_tokens()
+
+
+def _generate(
+    llm: ChatOpenAI,
+    enrichment_prompt: str,
+    cache: Optional[DiskCache] = None,
+) -> Generation:
+    """Calls the LLM for one rendered prompt, consulting the cache first.
 
-            test_case = LLMTestCase(
-                input=enrichment_prompt,
-                actual_output=enriched_output,
-                expected_output=expected,
-                context=[product["description"]],
+    Returns the enriched output, the token usage, whether it was a cache
+    hit and the log lines produced.
+    """
+
+    logs: list[str] = []
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(
+            llm.model_name, llm.temperature, enrichment_prompt
+        )
+        cached_output = cache.get(cache_key)
+        if cached_output is not None:
+            logs.append("   (cache) output reaproveitado")
+            return cached_output, (0, 0), True, logs
+
+    try:
+        response = llm.invoke(enrichment_prompt)
+        enriched_output = response.content
+        if cache is not None:
+            cache.set(cache_key, enriched_output)
+        return enriched_output, token_usage(response), False, logs
+    except Exception as e:
+        logs.append(f"   ERRO na geracao: {e}")
+        return "{}", (0, 0), False, logs
+
+
+def _generate_batch(
+    llm: ChatOpenAI,
+    prompt: Dict[str, Any],
+    products: List[Dict[str, Any]],
+    cache: Optional[DiskCache] = None,
+) -> List[Generation]:
+    """Enriches several products with one prompt in a single LLM call.
+
+    Cached products are skipped; the rest are packed into one numbered
+    request whose JSON answer is split back into per-product outputs.
+    Those outputs answer the batch prompt, not the single-product one, so
+    they are cached under keys of the batch prompt and task number and
+    are only reused by the same batch. Items missing from the answer, or
+    a whole answer that fails to parse, fall back to one ``_generate``
+    call per product. Batch tokens are split evenly.
+    """
+
+    rendered = [
+        _build_enrichment_prompt(prompt["template"], p) for p in products
+    ]
+    generations: List[Optional[Generation]] = [None] * len(products)
+
+    pending: list[int] = []
+    for i, enrichment_prompt in enumerate(rendered):
+        if cache is not None:
+            cached_output = cache.get(
+                cache.make_key(
+                    llm.model_name, llm.temperature, enrichment_prompt
+                )
             )
+            if cached_output is not None:
+                generations[i] = (
+                    cached_output,
+                    (0, 0),
+                    True,
+                    ["   (cache) output reaproveitado"],
+                )
+                continue
+        pending.append(i)
 
-            metric_results: Dict[str, Any] = {}
-            for metric in metrics:
-                try:
-                    metric.measure(test_case)
-                    metric_results[metric.name] = {
-                        "score": metric.score,
-                        "reason": metric.reason,
-                    }
-                    new_logs.append(
-                        f"   {metric.name}: {metric.score:.2f}"
-                    )
-                except Exception as e:
-                    metric_results[metric.name] = {
-                        "score": 0.0,
-                        "reason": f"Erro: {e}",
-                    }
-                    new_logs.append(
-                        f"   {metric.name}: erro - {e}"
-                    )
+    if len(pending) > 1:
+        tasks = "\n\n".join(
+            f"## Tarefa {n}\n{rendered[i]}"
+            for n, i in enumerate(pending, 1)
+        )
+        batch_prompt = BATCH_TEMPLATE.replace(
+            "{num_tasks}", str(len(pending))
+        ).replace("{tasks}", tasks)
 
-            scores = [
-                m["score"]
-                for m in metric_results.values()
-                if isinstance(m["score"], (int, float))
+        batch_keys: List[str] = []
+        if cache is not None:
+            batch_keys = [
+                cache.make_key(
+                    llm.model_name, llm.temperature, batch_prompt, n
+                )
+                for n in range(1, len(pending) + 1)
             ]
-            avg_score = sum(scores) / len(scores) if scores else 0.0
-
-            evaluation_results.append(
-                {
-                    "prompt_id": prompt["id"],
-                    "prompt_name": prompt["name"],
-                    "product_name": product["name"],
-                    "enriched_output": enriched_output,
-                    "metrics": metric_results,
-                    "avg_score": avg_score,
-                }
+            cached_outputs = [cache.get(key) for key in batch_keys]
+            if all(output is not None for output in cached_outputs):
+                for i, output in zip(pending, cached_outputs):
+                    generations[i] = (
+                        output,
+                        (0, 0),
+                        True,
+                        ["   (cache) output do lote reaproveitado"],
+                    )
+                return generations
+
+        answers: Dict[str, Any] = {}
+        batch_logs: list[str] = []
+        input_tokens, output_tokens = 0, 0
+        try:
+            response = llm.invoke(batch_prompt)
+            input_tokens, output_tokens = token_usage(response)
+            answers = json.loads(repair_json(response.content))
+            if not isinstance(answers, dict):
+                raise ValueError("resposta do lote nao e um objeto JSON")
+        except Exception as e:
+            batch_logs.append(f"   ERRO no lote, gerando individualmente: {e}")
+
+        share = (
+            input_tokens // len(pending),
+            output_tokens // len(pending),
+        )
+        for n, i in enumerate(pending, 1):
+            answer = answers.get(str(n))
+            if answer is None:
+                continue
+            enriched_output = (
+                answer
+                if isinstance(answer, str)
+                else json.dumps(answer, ensure_ascii=False, indent=2)
             )
+            if cache is not None:
+                cache.set(batch_keys[n - 1], enriched_output)
+            generations[i] = (enriched_output, share, False, [])
+
+        for i in pending:
+            if generations[i] is None:
+                output, item_usage, hit, logs = _generate(
+                    llm, rendered[i], cache
+                )
+                generations[i] = (output, item_usage, hit, batch_logs + logs)
+
+    for i in pending:
+        if generations[i] is None:
+            generations[i] = _generate(llm, rendered[i], cache)
 
-            new_logs.append(f"   Score medio: {avg_score:.2f}")
+    return generations
+
+
+def _evaluate_pair(
+    llm: ChatOpenAI,
+    metrics: list,
+    prompt: Dict[str, Any],
+    product: Dict[str, Any],
+    cache: Optional[DiskCache] = None,
+    generation: Optional[Generation] = None,
+    local_gate: float = 0.0,
+    generation_seconds: Optional[float] = None,
+) -> PairOutcome:
+    """Enriches one product with one prompt and scores the output.
+
+    When ``cache`` is given, a previous output for the same model,
+    temperature and rendered prompt is reused instead of calling the LLM.
+    A ``generation`` produced elsewhere (e.g. by a batched call) skips the
+    enrichment step entirely (its latency, if known, is passed as
+    ``generation_seconds``). Outputs whose local score falls below
+    ``local_gate`` are scored locally instead of by the LLM judge.
+
+    Returns the evaluation result (generation tokens under ``tokens``,
+    judge tokens under ``judge_tokens``), the log lines produced for the
+    pair (so concurrent callers can emit them in deterministic order) and
+    whether the output came from the cache.
+    """
+
+    logs: list[str] = []
+
+    # -- 1. Build enrichment prompt from template --
+    enrichment_prompt = _build_enrichment_prompt(prompt["template"], product)
+
+    logs.append("")
+    logs.append(f">> {prompt['name']}  x  {product['name']}")
+
+    # -- 2. Call LLM for enrichment (or reuse a cached output) --
+    if generation is None:
+        started = time.perf_counter()
+        generation = _generate(llm, enrichment_prompt, cache)
+        generation_seconds = time.perf_counter() - started
+    enriched_output, usage, cache_hit, generation_logs = generation
+    logs.extend(generation_logs)
+
+    # -- 3. Evaluate with DeepEval metrics --
+    expected = json.dumps(
+        product.get("expected_attributes", {}),
+        ensure_ascii=False,
+        indent=2,
+    )
+
+    test_case = LLMTestCase(
+        input=enrichment_prompt,
+        actual_output=enriched_output,
+        expected_output=expected,
+        context=[product["description"]],
+    )
+
+    local = compute_local_metrics(
+        enriched_output, product.get("expected_attributes", {})
+    )
+
+    judge_started = time.perf_counter()
+    metric_results: Dict[str, Any] = {}
+    pair_judge_tokens = 0
+    if local["local_score"] < local_gate:
+        # Structurally broken output: not worth three judge round-trips.
+        metric_results = local_metric_results(local, local_gate)
+        logs.append(
+            f"   Score local {local['local_score']:.2f} abaixo do limiar, "
+            f"juiz LLM ignorado"
+        )
+        for name, data in metric_results.items():
+            logs.append(f"   {name}: {data['score']:.2f} (local)")
+    else:
+        # The judge round-trips are independent, so all metrics for the
+        # pair are scored concurrently; failures stay isolated per metric.
+        metric_outcomes = run_ordered(
+            lambda metric: _measure_metric(metric, test_case),
+            metrics,
+            max_workers=len(metrics),
+        )
+        for entries, metric_tokens in metric_outcomes:
+            pair_judge_tokens += metric_tokens
+            for name, data, log_line in entries:
+                metric_results[name] = data
+                logs.append(log_line)
+    judge_seconds = time.perf_counter() - judge_started
+
+    scores = [
+        m["score"]
+        for m in metric_results.values()
+        if isinstance(m["score"], (int, float))
+    ]
+    avg_score = sum(scores) / len(scores) if scores else 0.0
+
+    logs.append(f"   Score medio: {avg_score:.2f}")
+
+    result = {
+        "prompt_id": prompt["id"],
+        "prompt_name": prompt["name"],
+        "product_id": product_id(product),
+        "product_name": product["name"],
+        "enriched_output": enriched_output,
+        "metrics": metric_results,
+        "avg_score": avg_score,
+        "local_metrics": local,
+        "tokens": sum(usage),
+        "output_tokens": usage[1],
+        "judge_tokens": pair_judge_tokens,
+        "generation_seconds": generation_seconds,
+        "judge_seconds": judge_seconds,
+    }
+    return result, logs, cache_hit
+
+
+def _evaluation_timings(
+    iteration: int,
+    model_name: str,
+    judge_model: str,
+    evaluation_results: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Generation and judge ``stage_timings`` entries for one run."""
+
+    return [
+        stage_timing(
+            iteration,
+            "geracao",
+            model_name,
+            (r.get("generation_seconds") for r in evaluation_results),
+            tokens=sum(r["tokens"] for r in evaluation_results),
+        ),
+        stage_timing(
+            iteration,
+            "juiz",
+            judge_model,
+            (r.get("judge_seconds") for r in evaluation_results),
+            tokens=sum(r.get("judge_tokens", 0) for r in evaluation_results),
+        ),
+    ]
+
+
+def _progress_key(
+    run_id: str,
+    model: str,
+    iteration: int,
+    prompt: Dict[str, Any],
+    product: Dict[str, Any],
+) -> str:
+    """Key of one scored pair in the run's progress checkpoint."""
+
+    return DiskCache.make_key(
+        run_id,
+        model,
+        iteration,
+        prompt["id"],
+        prompt["template"],
+        product_id(product),
+    )
+
+
+def _saved_outcome(progress: DiskCache, key: str) -> Optional[PairOutcome]:
+    """Returns a pair outcome checkpointed by an interrupted run, if any."""
+
+    saved = progress.get(key)
+    if saved is None:
+        return None
+    result, logs, cache_hit = saved
+    result = {**result, "resumed": True}
+    return result, logs + ["   (checkpoint) par retomado"], cache_hit
+
+
+def _elite_results(
+    leaderboard: List[Dict[str, Any]], run_id: str
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Full results of the leaderboard, read once from the run history."""
+
+    if not leaderboard or not run_id:
+        return {}
+    entries = HistoryStore(run_id).iter_entries()
+    return load_elite_results(leaderboard, entries)
+
+
+def _reused_outcome(
+    leaderboard: List[Dict[str, Any]],
+    elite_results: Dict[Tuple[str, str], Dict[str, Any]],
+    prompt: Dict[str, Any],
+    product: Dict[str, Any],
+) -> Optional[PairOutcome]:
+    """Returns an elite prompt's stored outcome on a product, if any."""
+
+    result = elite_result(
+        leaderboard, elite_results, prompt, product_id(product)
+    )
+    if result is None:
+        return None
+    logs = [
+        "",
+        f">> {prompt['name']}  x  {product['name']}",
+        "   (elite) resultado reaproveitado",
+        f"   Score medio: {result['avg_score']:.2f}",
+    ]
+    return result, logs, False
+
+
+def _evaluation_header(iteration: int, max_concurrency: int) -> List[str]:
+    """Returns the log banner that opens an evaluation run."""
+
+    logs: list[str] = []
+    logs.append("")
+    logs.append("=" * 60)
+    logs.append(
+        f"AGENTE 1 - AVALIADOR  |  Iteracao {iteration + 1}"
+    )
+    logs.append("=" * 60)
+    if max_concurrency > 1:
+        logs.append(f"Execucao concorrente: ate {max_concurrency} pares")
+    return logs
+
+
+def _collect_evaluations(
+    prompts: List[Dict[str, Any]],
+    outcomes: List[Tuple[Dict[str, Any], List[str], bool]],
+    cache: Optional[DiskCache],
+    logs: List[str],
+) -> List[Dict[str, Any]]:
+    """Gathers ordered pair outcomes into evaluation_results.
+
+    Appends the per-pair logs, the cache statistics and the per-prompt
+    summary to ``logs``. Only pairs generated in this run count as cache
+    misses; elite and checkpointed pairs are reported apart. Partial
+    results of pruned prompts stay out of the prompt averages.
+    """
+
+    evaluation_results: list[Dict[str, Any]] = []
+    cache_hits = cache_misses = 0
+    for result, pair_logs, cache_hit in outcomes:
+        evaluation_results.append(result)
+        logs.extend(pair_logs)
+        if cache_hit:
+            cache_hits += 1
+        elif not result.get("reused") and not result.get("resumed"):
+            cache_misses += 1
+
+    if cache is not None:
+        logs.append("")
+        logs.append(
+            f"Cache de enriquecimento: {cache_hits} hits / "
+            f"{cache_misses} misses / "
+            f"{len(outcomes) - cache_hits - cache_misses} reaproveitados"
+        )
 
     # Per-prompt summary
     for prompt in prompts:
         prompt_results = [
             r for r in evaluation_results if r["prompt_id"] == prompt["id"]
         ]
-        if prompt_results:
+        if not prompt_results:
+            continue
+        full_results = [r for r in prompt_results if not r.get("partial")]
+        logs.append("")
+        if full_results:
+            avg = sum(r["avg_score"] for r in full_results) / len(
+                full_results
+            )
+            logs.append(
+                f"Resumo {prompt['name']}: Score medio = {avg:.2f}"
+            )
+        else:
             avg = sum(r["avg_score"] for r in prompt_results) / len(
                 prompt_results
             )
-            new_logs.append("")
-            new_logs.append(
-                f"Resumo {prompt['name']}: Score medio = {avg:.2f}"
+            logs.append(
+                f"Resumo {prompt['name']}: eliminado na corrida "
+                f"(score parcial {avg:.2f})"
+            )
+
+    return evaluation_results
+
+
+def _attribute_summary(
+    prompts: List[Dict[str, Any]],
+    evaluation_results: List[Dict[str, Any]],
+    products: List[Dict[str, Any]],
+) -> List[str]:
+    """Log lines of the offline attribute-level signal per prompt,
+    computed for all pairs at once."""
+
+    attribute_scores = score_attributes(evaluation_results, products)
+    prompt_names = {p["id"]: p["name"] for p in prompts}
+    return [
+        f"Atributos {prompt_names.get(pid, pid)}: "
+        f"recall={summary['recall']:.2f}  "
+        f"precisao={summary['precision']:.2f}  "
+        f"valores={summary['value_accuracy']:.2f}"
+        for pid, summary in attribute_scores.per_prompt().items()
+    ]
+
+
+def _race(
+    run_pairs: Callable[[List[Tuple[Dict, Dict]]], List[PairOutcome]],
+    prompts: List[Dict[str, Any]],
+    products: List[Dict[str, Any]],
+    sample_size: int,
+    eta: int,
+    rng: random.Random,
+    logs: List[str],
+) -> List[PairOutcome]:
+    """Successive-halving tournament over prompts.
+
+    All prompts are scored on a small random product subset; only the
+    best ``1/eta`` survive each round while the subset grows ``eta``-fold.
+    Once a single prompt is left (or the subset covers every product) the
+    survivors are evaluated on the remaining products, so their scores
+    equal an exhaustive evaluation. Pairs are never evaluated twice.
+
+    Returns the outcomes in prompt x product order, including the partial
+    results of pruned prompts (marked with ``"partial": True``).
+    """
+
+    order = list(range(len(products)))
+    rng.shuffle(order)
+
+    done: Dict[Tuple[int, int], PairOutcome] = {}
+    survivors = list(range(len(prompts)))
+    budget = min(max(1, sample_size), len(order))
+    round_num = 1
+
+    while True:
+        if len(survivors) == 1:
+            budget = len(order)
+
+        needed = [
+            (pi, order[j])
+            for pi in survivors
+            for j in range(budget)
+            if (pi, order[j]) not in done
+        ]
+        for key, outcome in zip(
+            needed,
+            run_pairs([(prompts[pi], products[qi]) for pi, qi in needed]),
+        ):
+            done[key] = outcome
+
+        if budget == len(order):
+            break
+
+        means = {
+            pi: sum(
+                done[(pi, order[j])][0]["avg_score"] for j in range(budget)
             )
+            / budget
+            for pi in survivors
+        }
+        keep = max(1, math.ceil(len(survivors) / eta))
+        ranked = sorted(survivors, key=lambda pi: means[pi], reverse=True)
+        pruned = ranked[keep:]
+        survivors = sorted(ranked[:keep])
+
+        logs.append(
+            f"Corrida rodada {round_num}: {budget} produtos, "
+            f"{len(survivors)} prompt(s) seguem"
+        )
+        for pi in pruned:
+            logs.append(
+                f"   Eliminado: {prompts[pi]['name']} "
+                f"(score parcial {means[pi]:.2f})"
+            )
+
+        budget = min(budget * eta, len(order))
+        round_num += 1
+
+    outcomes: List[PairOutcome] = []
+    for pi in range(len(prompts)):
+        for qi in range(len(products)):
+            if (pi, qi) in done:
+                outcome = done[(pi, qi)]
+                if pi not in survivors:
+                    outcome[0]["partial"] = True
+                outcomes.append(outcome)
+    return outcomes
+
+
+def _stream_pairs(
+    run_pairs: Callable[[List[Tuple[Dict, Dict]]], List[PairOutcome]],
+    prompts: List[Dict[str, Any]],
+    products: Iterable[Dict[str, Any]],
+    chunk_size: int,
+) -> Tuple[List[PairOutcome], List[Dict[str, Any]]]:
+    """Evaluates every prompt against a (possibly lazy) product stream.
+
+    Products are pulled ``chunk_size`` at a time, so a catalog generator is
+    never fully materialised. Outcomes are regrouped in prompt x product
+    order, matching a run over a fully materialised list.
+
+    Returns the outcomes and a slim copy (name and expected attributes) of
+    every product seen, for the offline attribute scorer.
+    """
+
+    per_prompt: List[List[PairOutcome]] = [[] for _ in prompts]
+    seen: List[Dict[str, Any]] = []
+    iterator = iter(products)
+
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        seen.extend(
+            {
+                "name": p["name"],
+                "expected_attributes": p.get("expected_attributes", {}),
+            }
+            for p in chunk
+        )
+        chunk_outcomes = run_pairs(
+            [(prompt, product) for prompt in prompts for product in chunk]
+        )
+        for pi in range(len(prompts)):
+            per_prompt[pi].extend(
+                chunk_outcomes[pi * len(chunk):(pi + 1) * len(chunk)]
+            )
+
+    return [o for outcomes in per_prompt for o in outcomes], seen
+
+
+def evaluator_node(
+    state: OrchestratorState, enrichment_cache: bool = True
+) -> Dict[str, Any]:
+    """Runs each prompt x product combination, then scores with DeepEval.
+
+    Pairs are processed with at most ``max_concurrency`` calls in flight;
+    results and logs are reassembled in prompt x product order so the
+    output is identical to a serial run. With ``racing`` enabled, prompts
+    compete in a successive-halving tournament (see ``_race``) and only
+    the survivors are evaluated on every product.
+
+    With a ``run_id`` in state, every scored pair is checkpointed as soon
+    as it finishes, so a resumed run skips the pairs already paid for.
+    Prompts on the ``leaderboard`` reuse their stored results and are
+    only scored on products they have not seen yet.
+
+    Outputs are generated with ``model_name`` and judged with
+    ``judge_model`` (default: the same model). ``enrichment_cache=False``
+    skips the enrichment cache even with ``use_cache`` on, so every
+    result reports the tokens its generation actually costs.
+
+    Returns new evaluation_results, stage timings and log entries.
+    """
+
+    model_name = stage_model(state, "model_name")
+    judge_model = stage_model(state, "judge_model")
+    llm = get_chat_model(model_name, ENRICHMENT_TEMPERATURE)
+
+    products = iter_state_products(state)
+    prompts = state["current_prompts"]
+    iteration = state.get("iteration", 0)
+    max_concurrency = state.get("max_concurrency", 1)
+    use_cache = state.get("use_cache", False)
+    cache = (
+        get_cache("enrichment") if use_cache and enrichment_cache else None
+    )
+
+    new_logs = _evaluation_header(iteration, max_concurrency)
+
+    metrics = get_evaluation_metrics(
+        model=judge_model,
+        memoize=use_cache,
+        combined=state.get("combined_judge", False),
+    )
+
+    batch_size = max(
+        1, state.get("enrichment_batch_size", DEFAULT_BATCH_SIZE)
+    )
+    if batch_size > 1:
+        new_logs.append(
+            f"Enriquecimento em lotes de ate {batch_size} produtos"
+        )
+
+    local_gate = state.get("local_gate_threshold", 0.0)
+
+    run_id = state.get("run_id", "")
+    progress = get_cache("progress") if run_id else None
+    leaderboard = state.get("leaderboard", [])
+    elite_results = _elite_results(leaderboard, run_id)
+
+    def evaluate(
+        pair: Tuple[Dict, Dict],
+        generation: Optional[Generation] = None,
+        generation_seconds: Optional[float] = None,
+    ) -> PairOutcome:
+        outcome = _evaluate_pair(
+            llm,
+            metrics,
+            *pair,
+            cache=cache,
+            generation=generation,
+            local_gate=local_gate,
+            generation_seconds=generation_seconds,
+        )
+        if progress is not None:
+            key = _progress_key(run_id, model_name, iteration, *pair)
+            progress.set(key, list(outcome))
+        return outcome
+
+    def run_pairs(pairs: List[Tuple[Dict, Dict]]) -> List[PairOutcome]:
+        outcomes: List[Optional[PairOutcome]] = [
+            _reused_outcome(leaderboard, elite_results, *pair)
+            for pair in pairs
+        ]
+        if progress is not None:
+            for i, pair in enumerate(pairs):
+                if outcomes[i] is not None:
+                    continue
+                key = _progress_key(run_id, model_name, iteration, *pair)
+                outcomes[i] = _saved_outcome(progress, key)
+        pending = [i for i, outcome in enumerate(outcomes) if outcome is None]
+        fresh = run_fresh_pairs([pairs[i] for i in pending])
+        for i, outcome in zip(pending, fresh):
+            outcomes[i] = outcome
+        return outcomes
+
+    def run_fresh_pairs(
+        pairs: List[Tuple[Dict, Dict]]
+    ) -> List[PairOutcome]:
+        if batch_size == 1:
+            return run_ordered(evaluate, pairs, max_workers=max_concurrency)
+
+        # Chunk consecutive pairs sharing a prompt into batches of products
+        batches: list[Tuple[Dict, List[Dict]]] = []
+        for prompt, product in pairs:
+            if (
+                batches
+                and batches[-1][0] is prompt
+                and len(batches[-1][1]) < batch_size
+            ):
+                batches[-1][1].append(product)
+            else:
+                batches.append((prompt, [product]))
+
+        def generate_batch(
+            batch: Tuple[Dict, List[Dict]]
+        ) -> List[Tuple[Generation, float]]:
+            # A batch's latency is split evenly over its products
+            started = time.perf_counter()
+            generations = _generate_batch(llm, batch[0], batch[1], cache)
+            share = (time.perf_counter() - started) / len(generations)
+            return [(generation, share) for generation in generations]
+
+        generations = [
+            generation
+            for batch in run_ordered(
+                generate_batch, batches, max_workers=max_concurrency
+            )
+            for generation in batch
+        ]
+        return run_ordered(
+            lambda item: evaluate(item[0], *item[1]),
+            list(zip(pairs, generations)),
+            max_workers=max_concurrency,
+        )
+
+    sample_size = state.get("racing_sample_size", DEFAULT_RACING_SAMPLE_SIZE)
+    if state.get("racing") and len(prompts) > 1:
+        # Racing draws random subsets, so it needs the whole product list
+        products = list(products)
+    if (
+        state.get("racing")
+        and len(prompts) > 1
+        and len(products) > sample_size
+    ):
+        new_logs.append(
+            f"Modo corrida: amostra inicial de {sample_size} produtos"
+        )
+        outcomes = _race(
+            run_pairs,
+            prompts,
+            products,
+            sample_size=sample_size,
+            eta=max(2, state.get("racing_eta", DEFAULT_RACING_ETA)),
+            rng=random.Random(iteration),
+            logs=new_logs,
+        )
+    else:
+        outcomes, products = _stream_pairs(
+            run_pairs,
+            prompts,
+            products,
+            chunk_size=max(batch_size, max_concurrency) * STREAM_CHUNK_FACTOR,
+        )
+
+    evaluation_results = _collect_evaluations(
+        prompts, outcomes, cache, new_logs
+    )
+
+    new_logs.extend(
+        _attribute_summary(prompts, evaluation_results, products)
+    )
+
+    timings = _evaluation_timings(
+        iteration, model_name, judge_model, evaluation_results
+    )
+    new_logs.extend(timing_log(entry) for entry in timings)
 
     return {
         "evaluation_results": evaluation_results,
+        "tokens_used": sum(
+            r["tokens"] + r.get("judge_tokens", 0)
+            for r in evaluation_results
+        ),
+        "stage_timings": timings,
         "logs": new_logs,
         "status": "evaluation_complete",
     }
@@ -3,12 +3,27 @@
 import src.ssl_config  # noqa: F401
 
 import json
-from typing import Any, Dict
+import time
+from typing import Any, Dict, List, Mapping, Tuple
 
-import httpx
 from langchain_openai import ChatOpenAI
 
+from ..concurrency import run_ordered
+from ..data.catalog import iter_state_products
+from ..data.store import get_product
+from ..llm import get_chat_model, stage_model
 from ..state import OrchestratorState
+from ..structured_output import (
+    DEFAULT_PARSE_RETRIES,
+    FeedbackReview,
+    StructuredOutputError,
+    invoke_structured,
+    parse_totals,
+)
+from ..timing import stage_timing, timing_log
+
+FEEDBACK_TEMPERATURE = 0.3
+DEFAULT_FEEDBACK_TIMEOUT = 60.0
 
 FEEDBACK_SYSTEM = (
     "Voce e um analista de qualidade de catalogo de e-commerce. "
@@ -59,121 +74,160 @@ Responda APENAS com um JSON valido no formato:
 }}"""
 
 
-def feedback_node(state: OrchestratorState) -> Dict[str, Any]:
-    """Simulates a user reviewing each enriched output and giving feedback.
+def _build_feedback_prompt(
+    result: Dict[str, Any], product: Mapping[str, Any]
+) -> str:
+    """Renders FEEDBACK_TEMPLATE for one evaluation result."""
+
+    return FEEDBACK_TEMPLATE.replace(
+        "{product_name}", product.get("name", "")
+    ).replace(
+        "{category}", product.get("category", "")
+    ).replace(
+        "{description}", product.get("description", "")
+    ).replace(
+        "{original_attributes}",
+        json.dumps(
+            product.get("attributes", {}),
+            ensure_ascii=False,
+            indent=2,
+        ),
+    ).replace(
+        "{expected_attributes}",
+        json.dumps(
+            product.get("expected_attributes", {}),
+            ensure_ascii=False,
+            indent=2,
+        ),
+    ).replace(
+        "{enriched_output}", result.get("enriched_output", "{}")
+    ).replace(
+        "{prompt_name}", result.get("prompt_name", "")
+    )
 
-    Returns feedback_results and accumulated feedback_history.
-    """
 
-    model_name = state.get("model_name", "gpt-4o-mini")
-    llm = ChatOpenAI(
-        model=model_name,
-        temperature=0.3,
-        http_client=httpx.Client(verify=False),
-    )
+def _review_result(
+    llm: ChatOpenAI,
+    result: Dict[str, Any],
+    product: Mapping[str, Any],
+    retries: int = DEFAULT_PARSE_RETRIES,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Asks the simulated user to review one evaluation result.
 
-    evaluation_results = state["evaluation_results"]
-    products = state["products"]
-    iteration = state.get("iteration", 0)
+    The review is constrained to the FeedbackReview schema, with up to
+    ``retries`` retries when it does not parse. Each call is bounded by
+    the timeout ``llm`` was built with.
 
-    new_logs: list[str] = []
-    new_logs.append("")
-    new_logs.append("=" * 60)
-    new_logs.append(
-        f"AGENTE 4 - FEEDBACK SIMULADO  |  Iteracao {iteration + 1}"
-    )
-    new_logs.append("=" * 60)
+    Returns the feedback entry and the log lines produced for it, so
+    concurrent callers can emit them in deterministic order.
+    """
 
-    # Build product lookup
-    product_map = {p["name"]: p for p in products}
+    logs: list[str] = []
+    prompt_text = _build_feedback_prompt(result, product)
 
-    feedback_results: list[Dict[str, Any]] = []
+    logs.append(
+        f">> Revisando: {result['prompt_name']}  x  {result['product_name']}"
+    )
 
-    for result in evaluation_results:
-        product = product_map.get(result["product_name"], {})
-
-        prompt_text = FEEDBACK_TEMPLATE.replace(
-            "{product_name}", product.get("name", "")
-        ).replace(
-            "{category}", product.get("category", "")
-        ).replace(
-            "{description}", product.get("description", "")
-        ).replace(
-            "{original_attributes}",
-            json.dumps(
-                product.get("attributes", {}),
-                ensure_ascii=False,
-                indent=2,
-            ),
-        ).replace(
-            "{expected_attributes}",
-            json.dumps(
-                product.get("expected_attributes", {}),
-                ensure_ascii=False,
-                indent=2,
-            ),
-        ).replace(
-            "{enriched_output}", result.get("enriched_output", "{}")
-        ).replace(
-            "{prompt_name}", result.get("prompt_name", "")
+    tokens = 0
+    parse = parse_totals([])
+    started = time.perf_counter()
+    try:
+        review, tokens, parse = invoke_structured(
+            llm,
+            [
+                {"role": "system", "content": FEEDBACK_SYSTEM},
+                {"role": "user", "content": prompt_text},
+            ],
+            FeedbackReview,
+            retries=retries,
         )
+        feedback = review.model_dump()
+        if parse["repaired"]:
+            logs.append("   Resposta fora do schema reparada localmente")
+
+        positivos = feedback.get("positivos", 0)
+        negativos = feedback.get("negativos", 0)
+        total = feedback.get("total_atributos", positivos + negativos)
 
-        new_logs.append(
-            f">> Revisando: {result['prompt_name']}  x  {result['product_name']}"
+        logs.append(
+            f"   Positivos: {positivos}  |  Negativos: {negativos}  "
+            f"|  Total: {total}"
+        )
+        logs.append(
+            f"   Comentario: {feedback.get('comentario_geral', '')[:150]}"
         )
 
-        try:
-            response = llm.invoke(
-                [
-                    {"role": "system", "content": FEEDBACK_SYSTEM},
-                    {"role": "user", "content": prompt_text},
-                ]
-            )
-            response_text = response.content
-
-            json_start = response_text.find("{")
-            json_end = response_text.rfind("}") + 1
-            if json_start >= 0 and json_end > json_start:
-                feedback = json.loads(response_text[json_start:json_end])
-            else:
-                feedback = json.loads(response_text)
-
-            positivos = feedback.get("positivos", 0)
-            negativos = feedback.get("negativos", 0)
-            total = feedback.get("total_atributos", positivos + negativos)
-
-            new_logs.append(
-                f"   Positivos: {positivos}  |  Negativos: {negativos}  "
-                f"|  Total: {total}"
-            )
-            new_logs.append(
-                f"   Comentario: {feedback.get('comentario_geral', '')[:150]}"
-            )
-
-        except Exception as e:
-            new_logs.append(f"   ERRO no feedback: {e}")
-            feedback = {
-                "total_atributos": 0,
-                "positivos": 0,
-                "negativos": 0,
-                "feedbacks": [],
-                "comentario_geral": f"Erro: {e}",
-            }
-            positivos = 0
-            negativos = 0
+    except Exception as e:
+        if isinstance(e, StructuredOutputError):
+            tokens, parse = e.tokens, e.outcome
+        logs.append(f"   ERRO no feedback: {e}")
+        feedback = {
+            "total_atributos": 0,
+            "positivos": 0,
+            "negativos": 0,
+            "feedbacks": [],
+            "comentario_geral": f"Erro: {e}",
+        }
+        positivos = 0
+        negativos = 0
+
+    entry = {
+        "prompt_id": result["prompt_id"],
+        "prompt_name": result["prompt_name"],
+        "product_id": result.get("product_id"),
+        "product_name": result["product_name"],
+        "positivos": positivos,
+        "negativos": negativos,
+        "total_atributos": feedback.get("total_atributos", 0),
+        "feedbacks": feedback.get("feedbacks", []),
+        "comentario_geral": feedback.get("comentario_geral", ""),
+        "tokens": tokens,
+        "seconds": time.perf_counter() - started,
+        "parse": parse,
+    }
+    return entry, logs
 
-        feedback_results.append(
-            {
-                "prompt_id": result["prompt_id"],
-                "prompt_name": result["prompt_name"],
-                "product_name": result["product_name"],
-                "positivos": positivos,
-                "negativos": negativos,
-                "total_atributos": feedback.get("total_atributos", 0),
-                "feedbacks": feedback.get("feedbacks", []),
-                "comentario_geral": feedback.get("comentario_geral", ""),
-            }
-        )
+
+def _lookup_product(
+    result: Dict[str, Any], product_map: Dict[str, Any]
+) -> Mapping[str, Any]:
+    """Finds the product an evaluation result refers to."""
+
+    if result["product_name"] in product_map:
+        return product_map[result["product_name"]]
+    try:
+        return get_product(result.get("product_id", ""))
+    except KeyError:
+        return {}
+
+
+def _feedback_header(iteration: int) -> List[str]:
+    """Returns the log banner that opens a feedback run."""
+
+    logs: list[str] = []
+    logs.append("")
+    logs.append("=" * 60)
+    logs.append(
+        f"AGENTE 4 - FEEDBACK SIMULADO  |  Iteracao {iteration + 1}"
+    )
+    logs.append("=" * 60)
+    return logs
+
+
+def _collect_feedback(
+    outcomes: List[Tuple[Dict[str, Any], List[str]]],
+    logs: List[str],
+) -> List[Dict[str, Any]]:
+    """Gathers ordered review outcomes into feedback_results.
+
+    Appends the per-review logs and the per-prompt summary to ``logs``.
+    """
+
+    feedback_results: list[Dict[str, Any]] = []
+    for entry, review_logs in outcomes:
+        feedback_results.append(entry)
+        logs.extend(review_logs)
 
     # Summary per prompt
     prompt_ids_seen: list[str] = []
@@ -185,12 +239,77 @@ def feedback_node(state: OrchestratorState) -> Dict[str, Any]:
         total_pos = sum(fb["positivos"] for fb in group)
         total_neg = sum(fb["negativos"] for fb in group)
         pname = group[0]["prompt_name"] if group else pid
-        new_logs.append("")
-        new_logs.append(
+        logs.append("")
+        logs.append(
             f"Resumo feedback {pname}: "
             f"+{total_pos} positivos / -{total_neg} negativos"
         )
 
+    return feedback_results
+
+
+def feedback_node(state: OrchestratorState) -> Dict[str, Any]:
+    """Simulates a user reviewing each enriched output and giving feedback.
+
+    Reviews are dispatched with at most ``max_concurrency`` calls in
+    flight, each bounded by ``feedback_timeout`` seconds; results keep the
+    order of ``evaluation_results``.
+
+    Reviews use ``feedback_model`` (default: ``model_name``); a review
+    that does not parse is retried up to ``parse_retries`` times.
+
+    Returns feedback_results, accumulated feedback_history and the stage
+    timing.
+    """
+
+    feedback_model = stage_model(state, "feedback_model")
+    timeout = state.get("feedback_timeout", DEFAULT_FEEDBACK_TIMEOUT)
+    llm = get_chat_model(feedback_model, FEEDBACK_TEMPERATURE, timeout)
+
+    # Results reused from the elite leaderboard were reviewed when first
+    # scored
+    evaluation_results = [
+        r for r in state["evaluation_results"] if not r.get("reused")
+    ]
+    iteration = state.get("iteration", 0)
+    max_concurrency = state.get("max_concurrency", 1)
+    retries = state.get("parse_retries", DEFAULT_PARSE_RETRIES)
+
+    new_logs = _feedback_header(iteration)
+
+    # Products registered in the shared store are resolved by ID on
+    # demand; other sources need a lookup of the evaluated products.
+    product_map: Dict[str, Any] = {}
+    if not state.get("product_ids"):
+        wanted = {r["product_name"] for r in evaluation_results}
+        product_map = {
+            p["name"]: p
+            for p in iter_state_products(state)
+            if p["name"] in wanted
+        }
+
+    outcomes = run_ordered(
+        lambda result: _review_result(
+            llm,
+            result,
+            _lookup_product(result, product_map),
+            retries,
+        ),
+        evaluation_results,
+        max_workers=max_concurrency,
+    )
+
+    feedback_results = _collect_feedback(outcomes, new_logs)
+    timing = stage_timing(
+        iteration,
+        "feedback",
+        feedback_model,
+        (fb["seconds"] for fb in feedback_results),
+        tokens=sum(fb["tokens"] for fb in feedback_results),
+        parse=parse_totals(fb["parse"] for fb in feedback_results),
+    )
+    new_logs.append(timing_log(timing))
+
     return {
         "feedback_results": feedback_results,
         "feedback_history": [
@@ -199,6 +318,8 @@ def feedback_node(state: OrchestratorState) -> Dict[str, Any]:
                 "feedbacks": feedback_results,
             }
         ],
+        "tokens_used": sum(fb["tokens"] for fb in feedback_results),
+        "stage_timings": [timing],
         "logs": new_logs,
         "status": "feedback_complete",
     }
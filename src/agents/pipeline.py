@@ -0,0 +1,202 @@
+"""Agents 1 + 4 pipelined: reviews start as soon as each evaluation lands."""
+
+import src.ssl_config  # noqa: F401  — ensure SSL patch is active
+
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..cache import get_cache
+from ..data.catalog import iter_state_products
+from ..evaluation.metrics import get_evaluation_metrics
+from ..llm import get_chat_model, stage_model
+from ..state import OrchestratorState
+from ..structured_output import DEFAULT_PARSE_RETRIES, parse_totals
+from ..timing import stage_timing, timing_log
+from .evaluator import (
+    ENRICHMENT_TEMPERATURE,
+    _attribute_summary,
+    _collect_evaluations,
+    _elite_results,
+    _evaluate_pair,
+    _evaluation_header,
+    _evaluation_timings,
+    _progress_key,
+    _reused_outcome,
+    _saved_outcome,
+)
+from .feedback import (
+    DEFAULT_FEEDBACK_TIMEOUT,
+    FEEDBACK_TEMPERATURE,
+    _collect_feedback,
+    _feedback_header,
+    _review_result,
+)
+
+
+def pipeline_node(state: OrchestratorState) -> Dict[str, Any]:
+    """Evaluates prompt x product pairs and reviews them in one stage.
+
+    Evaluation workers push each finished result into a bounded queue that
+    feedback workers drain concurrently, so the first reviews run while
+    later pairs are still being generated. The queue bound applies
+    backpressure when reviewing falls behind.
+
+    Returns the same evaluation_results, feedback_results, feedback_history
+    and logs that evaluator_node followed by feedback_node would produce,
+    including the per-pair progress checkpoint.
+
+    Unlike evaluator_node, this node ignores ``enrichment_batch_size`` and
+    ``racing`` (every pair is generated individually and evaluated on
+    every product) and materialises the whole product list, so a streamed
+    catalog is loaded into memory. The UI warns when these settings are
+    combined with pipeline mode.
+    """
+
+    model_name = stage_model(state, "model_name")
+    judge_model = stage_model(state, "judge_model")
+    feedback_model = stage_model(state, "feedback_model")
+    enrich_llm = get_chat_model(model_name, ENRICHMENT_TEMPERATURE)
+    timeout = state.get("feedback_timeout", DEFAULT_FEEDBACK_TIMEOUT)
+    feedback_llm = get_chat_model(
+        feedback_model, FEEDBACK_TEMPERATURE, timeout
+    )
+
+    # Reviews look products up by name, so the list is materialised
+    products = list(iter_state_products(state))
+    prompts = state["current_prompts"]
+    iteration = state.get("iteration", 0)
+    max_concurrency = max(1, state.get("max_concurrency", 1))
+    retries = state.get("parse_retries", DEFAULT_PARSE_RETRIES)
+    use_cache = state.get("use_cache", False)
+    cache = get_cache("enrichment") if use_cache else None
+
+    metrics = get_evaluation_metrics(
+        model=judge_model,
+        memoize=use_cache,
+        combined=state.get("combined_judge", False),
+    )
+    product_map = {p["name"]: p for p in products}
+    local_gate = state.get("local_gate_threshold", 0.0)
+    run_id = state.get("run_id", "")
+    progress = get_cache("progress") if run_id else None
+    leaderboard = state.get("leaderboard", [])
+    elite_results = _elite_results(leaderboard, run_id)
+
+    pairs = [(prompt, product) for prompt in prompts for product in products]
+    evaluations: List[Optional[Tuple[Dict[str, Any], List[str], bool]]] = [
+        None
+    ] * len(pairs)
+    reviews: List[Optional[Tuple[Dict[str, Any], List[str]]]] = [
+        None
+    ] * len(pairs)
+    handoff: "queue.Queue[Optional[int]]" = queue.Queue(
+        maxsize=max_concurrency * 2
+    )
+
+    def evaluate(index: int) -> None:
+        try:
+            key = _progress_key(
+                run_id, model_name, iteration, *pairs[index]
+            )
+            outcome = _reused_outcome(
+                leaderboard, elite_results, *pairs[index]
+            )
+            if outcome is None and progress is not None:
+                outcome = _saved_outcome(progress, key)
+            if outcome is None:
+                outcome = _evaluate_pair(
+                    enrich_llm,
+                    metrics,
+                    *pairs[index],
+                    cache=cache,
+                    local_gate=local_gate,
+                )
+                if progress is not None:
+                    progress.set(key, list(outcome))
+            evaluations[index] = outcome
+        finally:
+            handoff.put(index)
+
+    def review_worker() -> None:
+        while True:
+            index = handoff.get()
+            if index is None:
+                return
+            if evaluations[index] is None:
+                continue
+            result = evaluations[index][0]
+            if result.get("reused"):
+                # Elite results were already reviewed when first scored
+                continue
+            reviews[index] = _review_result(
+                feedback_llm,
+                result,
+                product_map.get(result["product_name"], {}),
+                retries,
+            )
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as eval_pool, \
+            ThreadPoolExecutor(max_workers=max_concurrency) as review_pool:
+        reviewers = [
+            review_pool.submit(review_worker) for _ in range(max_concurrency)
+        ]
+        evaluators = [
+            eval_pool.submit(evaluate, i) for i in range(len(pairs))
+        ]
+        wait(evaluators)
+        for _ in reviewers:
+            handoff.put(None)
+        for future in evaluators + reviewers:
+            future.result()
+
+    new_logs = _evaluation_header(iteration, max_concurrency)
+    new_logs.append("Modo pipeline: feedback iniciado a cada avaliacao")
+    if state.get("enrichment_batch_size", 1) > 1 or state.get("racing"):
+        new_logs.append(
+            "Modo pipeline ignora produtos por chamada e corrida de prompts"
+        )
+    evaluation_results = _collect_evaluations(
+        prompts, evaluations, cache, new_logs
+    )
+    new_logs.extend(
+        _attribute_summary(prompts, evaluation_results, products)
+    )
+
+    new_logs.extend(_feedback_header(iteration))
+    feedback_results = _collect_feedback(
+        [review for review in reviews if review is not None], new_logs
+    )
+
+    timings = _evaluation_timings(
+        iteration, model_name, judge_model, evaluation_results
+    ) + [
+        stage_timing(
+            iteration,
+            "feedback",
+            feedback_model,
+            (fb["seconds"] for fb in feedback_results),
+            tokens=sum(fb["tokens"] for fb in feedback_results),
+            parse=parse_totals(fb["parse"] for fb in feedback_results),
+        )
+    ]
+    new_logs.extend(timing_log(entry) for entry in timings)
+
+    return {
+        "evaluation_results": evaluation_results,
+        "feedback_results": feedback_results,
+        "feedback_history": [
+            {
+                "iteration": iteration + 1,
+                "feedbacks": feedback_results,
+            }
+        ],
+        "tokens_used": sum(
+            r["tokens"] + r.get("judge_tokens", 0)
+            for r in evaluation_results
+        )
+        + sum(fb["tokens"] for fb in feedback_results),
+        "stage_timings": timings,
+        "logs": new_logs,
+        "status": "feedback_complete",
+    }
@@ -2,13 +2,21 @@
 
 from typing import Any, Dict
 
+from ..convergence import check_convergence, iteration_best_score
+from ..history_store import HistoryStore, compact_entry, summarize_iteration
+from ..leaderboard import update_leaderboard
 from ..state import OrchestratorState
 
 
 def runner_node(state: OrchestratorState) -> Dict[str, Any]:
     """Saves the current iteration to history and sets up the next one.
 
-    Returns updated current_prompts, iteration counter, and history entry.
+    With ``elite_size`` set, the best prompts so far are kept on the
+    ``leaderboard`` and carried into the next iteration alongside the
+    suggestions.
+
+    Returns updated current_prompts, iteration counter, leaderboard and
+    history entry.
     """
 
     suggestions = state["suggestions"]
@@ -26,15 +34,38 @@ def runner_node(state: OrchestratorState) -> Dict[str, Any]:
 
     feedback_results = state.get("feedback_results", [])
 
-    # Build a history snapshot for this iteration (returned as single-item
-    # list so the Annotated[..., operator.add] reducer appends it).
+    # Build a history snapshot for this iteration (returned in a list so
+    # the merge_by_iteration reducer upserts it).
     history_entry = {
         "iteration": iteration + 1,
         "prompts_used": current_prompts,
         "evaluations": evaluation_results,
         "feedback": feedback_results,
         "suggestions": suggestions,
+        "best_score": iteration_best_score(evaluation_results),
     }
+    history_entry["summary"] = summarize_iteration(history_entry)
+
+    # Every full snapshot goes to the run's append-only file on disk
+    run_id = state.get("run_id")
+    if run_id:
+        HistoryStore(run_id).append(history_entry)
+
+    # Only the last ``history_retention`` iterations stay in full in
+    # state; older ones are replaced by their aggregates.
+    history_update = [history_entry]
+    feedback_update: list[Dict[str, Any]] = []
+    retention = state.get("history_retention", 0)
+    if retention:
+        cutoff = iteration + 1 - retention
+        for entry in state.get("history", []):
+            if entry["iteration"] <= cutoff and not entry.get("compacted"):
+                history_update.append(compact_entry(entry))
+        for fb in state.get("feedback_history", []):
+            if fb["iteration"] <= cutoff and not fb.get("compacted"):
+                feedback_update.append(
+                    {"iteration": fb["iteration"], "compacted": True}
+                )
 
     new_logs.append(f"Iteracao {iteration + 1} salva no historico")
     new_logs.append(
@@ -43,17 +74,56 @@ def runner_node(state: OrchestratorState) -> Dict[str, Any]:
     for s in suggestions:
         new_logs.append(f"   - {s.get('name', s.get('id', '?'))}")
 
+    next_prompts = suggestions
+    leaderboard = state.get("leaderboard", [])
+    elite_size = state.get("elite_size", 0)
+    if elite_size:
+        leaderboard = update_leaderboard(
+            leaderboard,
+            current_prompts,
+            evaluation_results,
+            elite_size,
+            iteration + 1,
+        )
+        suggested_ids = {s.get("id") for s in suggestions}
+        elites = [
+            entry["prompt"]
+            for entry in leaderboard
+            if entry["prompt"]["id"] not in suggested_ids
+        ]
+        next_prompts = suggestions + elites
+        for entry in leaderboard:
+            new_logs.append(
+                f"   Elite: {entry['prompt']['name']} "
+                f"({entry['score']:.2f} em {len(entry['results'])} produtos)"
+            )
+
     next_iteration = iteration + 1
 
-    if next_iteration >= state["max_iterations"]:
+    best_scores = [
+        entry.get("best_score", 0.0) for entry in state.get("history", [])
+    ] + [history_entry["best_score"]]
+    new_logs.append(
+        f"Melhor score da iteracao: {history_entry['best_score']:.2f}  |  "
+        f"Tokens acumulados: {state.get('tokens_used', 0)}"
+    )
+
+    stop_reason = check_convergence(state, best_scores)
+    if stop_reason is None and next_iteration >= state["max_iterations"]:
+        stop_reason = "Limite de iteracoes atingido"
+
+    if stop_reason:
         new_logs.append("")
-        new_logs.append("Limite de iteracoes atingido. Finalizando.")
+        new_logs.append(f"{stop_reason}. Finalizando.")
 
     return {
-        "current_prompts": suggestions,
+        "current_prompts": next_prompts,
+        "leaderboard": leaderboard,
         "evaluation_results": [],  # reset for next cycle
         "iteration": next_iteration,
-        "history": [history_entry],  # single-item list for reducer
+        "history": history_update,
+        "feedback_history": feedback_update,
+        "stop_reason": stop_reason or "",
         "logs": new_logs,
         "status": "ready_for_next_iteration",
     }
@@ -2,13 +2,36 @@
 
 import src.ssl_config  # noqa: F401  — ensure SSL patch is active
 
-import json
-from typing import Any, Dict
+import time
+from typing import Any, Dict, List, Tuple
 
-import httpx
 from langchain_openai import ChatOpenAI
 
+from ..concurrency import run_ordered
+from ..context_builder import (
+    build_suggester_context,
+    count_tokens,
+    tokenizer_available,
+)
+from ..evaluation.similarity import normalize_template
+from ..llm import get_chat_model, stage_model
 from ..state import OrchestratorState
+from ..structured_output import (
+    DEFAULT_PARSE_RETRIES,
+    StructuredOutputError,
+    SuggestionList,
+    invoke_structured,
+    parse_totals,
+)
+from ..timing import stage_timing, timing_log
+
+SUGGESTER_TEMPERATURE = 0.7
+DEFAULT_NUM_SUGGESTIONS = 2
+DEFAULT_POPULATION_PARENTS = 2
+DEFAULT_POPULATION_CALLS = 4
+# Temperatures cycled across the concurrent calls of population mode,
+# from conservative mutations to more exploratory ones
+POPULATION_TEMPERATURES = (0.5, 0.8, 1.0, 1.2)
 
 SUGGESTER_SYSTEM = (
     "Voce e um especialista em engenharia de prompts para LLMs, "
@@ -43,41 +66,72 @@ Para cada sugestao:
 IMPORTANTE: Os templates DEVEM usar exatamente estas variaveis de formatacao Python:
 {{product_name}}, {{category}}, {{description}}, {{brand}}, {{attributes}}
 
-Responda APENAS com um JSON valido (array) no formato:
-[
-    {{
-        "id": "prompt_v{{N}}",
-        "name": "Nome descritivo da variacao",
-        "template": "O template completo do prompt usando {{product_name}}, {{category}}, {{description}}, {{brand}}, {{attributes}}",
-        "rationale": "Explicacao detalhada do racional e das melhorias propostas"
-    }}
-]"""
-
-
-def suggester_node(state: OrchestratorState) -> Dict[str, Any]:
-    """Analyses evaluation scores and proposes improved prompt variations.
-
-    Returns new suggestions and log entries.
+Responda APENAS com um JSON valido no formato:
+{{
+    "suggestions": [
+        {{
+            "id": "prompt_v{{N}}",
+            "name": "Nome descritivo da variacao",
+            "template": "O template completo do prompt usando {{product_name}}, {{category}}, {{description}}, {{brand}}, {{attributes}}",
+            "rationale": "Explicacao detalhada do racional e das melhorias propostas"
+        }}
+    ]
+}}"""
+
+EVOLUTION_INSTRUCTIONS = """
+
+## Modo evolutivo
+
+Os prompts atuais sao os {num_parents} melhores da populacao (os pais).
+Gere cada variacao como uma MUTACAO (alterar instrucoes, exemplos ou
+formato de um pai) ou um CROSSOVER (combinar os pontos fortes de dois
+pais). No campo "rationale", indique o tipo de operacao e o(s) pai(s)
+usado(s)."""
+
+
+def _prompt_scores(
+    evaluation_results: List[Dict[str, Any]]
+) -> Dict[str, float]:
+    """Average score per prompt id, ignoring partial (pruned) results."""
+
+    scores: Dict[str, List[float]] = {}
+    for r in evaluation_results:
+        if not r.get("partial"):
+            scores.setdefault(r["prompt_id"], []).append(r["avg_score"])
+    return {pid: sum(s) / len(s) for pid, s in scores.items()}
+
+
+def _build_suggester_prompt(
+    evaluation_results: List[Dict[str, Any]],
+    feedback_results: List[Dict[str, Any]],
+    prompts: List[Dict[str, Any]],
+    num_suggestions: int,
+    context_tokens: int = 0,
+    model: str = "",
+) -> str:
+    """Renders SUGGESTER_TEMPLATE for the given prompts and their results.
+
+    With ``context_tokens`` set, the sections are aggregated and fitted to
+    that token budget (see ``context_builder``); otherwise every
+    evaluation, feedback and template is listed in full.
     """
 
-    model_name = state.get("model_name", "gpt-4o-mini")
-    llm = ChatOpenAI(
-        model=model_name,
-        temperature=0.7,
-        http_client=httpx.Client(verify=False),
-    )
-
-    evaluation_results = state["evaluation_results"]
-    current_prompts = state["current_prompts"]
-    iteration = state.get("iteration", 0)
-
-    new_logs: list[str] = []
-    new_logs.append("")
-    new_logs.append("=" * 60)
-    new_logs.append(
-        f"AGENTE 2 - SUGESTOR DE PROMPTS  |  Iteracao {iteration + 1}"
-    )
-    new_logs.append("=" * 60)
+    if context_tokens:
+        evaluation_summary, feedback_summary, prompts_summary = (
+            build_suggester_context(
+                evaluation_results,
+                feedback_results,
+                prompts,
+                budget=context_tokens,
+                model=model,
+            )
+        )
+        return SUGGESTER_TEMPLATE.format(
+            evaluation_summary=evaluation_summary,
+            feedback_summary=feedback_summary,
+            current_prompts=prompts_summary,
+            num_suggestions=num_suggestions,
+        )
 
     # Build evaluation summary
     eval_parts: list[str] = []
@@ -93,7 +147,6 @@ def suggester_node(state: OrchestratorState) -> Dict[str, Any]:
     evaluation_summary = "\n".join(eval_parts)
 
     # Build feedback summary
-    feedback_results = state.get("feedback_results", [])
     fb_parts: list[str] = []
     for fb in feedback_results:
         fb_parts.append(
@@ -120,7 +173,7 @@ def suggester_node(state: OrchestratorState) -> Dict[str, Any]:
 
     # Build prompts summary
     prompts_parts: list[str] = []
-    for p in current_prompts:
+    for p in prompts:
         prompts_parts.append(
             f"### {p['name']} (ID: {p['id']})\n"
             f"Racional: {p.get('rationale', 'N/A')}\n"
@@ -128,49 +181,244 @@ def suggester_node(state: OrchestratorState) -> Dict[str, Any]:
         )
     prompts_summary = "\n\n".join(prompts_parts)
 
-    user_prompt = SUGGESTER_TEMPLATE.format(
+    return SUGGESTER_TEMPLATE.format(
         evaluation_summary=evaluation_summary,
         feedback_summary=feedback_summary,
         current_prompts=prompts_summary,
-        num_suggestions=2,
+        num_suggestions=num_suggestions,
+    )
+
+
+def _request_suggestions(
+    llm: ChatOpenAI, user_prompt: str, retries: int = DEFAULT_PARSE_RETRIES
+) -> Tuple[List[Dict[str, Any]], int, float, Dict[str, int]]:
+    """Calls the suggester once, constrained to the SuggestionList schema.
+
+    Returns the suggestions, tokens spent, the call latency and the parse
+    outcome; raises StructuredOutputError when no response parses within
+    ``retries`` retries.
+    """
+
+    started = time.perf_counter()
+    response, tokens, parse = invoke_structured(
+        llm,
+        [
+            {"role": "system", "content": SUGGESTER_SYSTEM},
+            {"role": "user", "content": user_prompt},
+        ],
+        SuggestionList,
+        retries=retries,
+    )
+    seconds = time.perf_counter() - started
+    suggestions = [s.model_dump() for s in response.suggestions]
+    return suggestions, tokens, seconds, parse
+
+
+def _evolve_population(
+    state: OrchestratorState,
+    suggester_model: str,
+    new_logs: List[str],
+) -> Tuple[List[Dict[str, Any]], int, List[float], Dict[str, int]]:
+    """Population mode: concurrent mutation/crossover calls over the top-k.
+
+    ``population_calls`` suggester calls run concurrently, each at a
+    different temperature from POPULATION_TEMPERATURES, and together ask
+    for ``population_size`` children of the ``population_parents`` best
+    prompts. Children are deduplicated by normalised template (also
+    against their parents); if fewer than ``population_size`` remain, the
+    best parents fill the gap, so the population size stays fixed.
+
+    Returns the next population, tokens spent, per-call latencies and the
+    summed parse outcome.
+    """
+
+    evaluation_results = state["evaluation_results"]
+    current_prompts = state["current_prompts"]
+    iteration = state.get("iteration", 0)
+    size = state["population_size"]
+    num_parents = state.get("population_parents", DEFAULT_POPULATION_PARENTS)
+    calls = max(1, state.get("population_calls", DEFAULT_POPULATION_CALLS))
+    retries = state.get("parse_retries", DEFAULT_PARSE_RETRIES)
+
+    scores = _prompt_scores(evaluation_results)
+    ranked = sorted(
+        current_prompts, key=lambda p: scores.get(p["id"], 0.0), reverse=True
+    )
+    parents = ranked[:num_parents]
+    parent_ids = {p["id"] for p in parents}
+    user_prompt = _build_suggester_prompt(
+        [r for r in evaluation_results if r["prompt_id"] in parent_ids],
+        [
+            fb
+            for fb in state.get("feedback_results", [])
+            if fb["prompt_id"] in parent_ids
+        ],
+        parents,
+        num_suggestions=-(-size // calls),
+        context_tokens=state.get("suggester_context_tokens", 0),
+        model=suggester_model,
+    ) + EVOLUTION_INSTRUCTIONS.format(num_parents=len(parents))
+
+    new_logs.append(
+        f">> Modo evolutivo: {calls} chamadas simultaneas, "
+        f"{len(parents)} pais, populacao de {size}"
+    )
+
+    def call(
+        temperature: float,
+    ) -> Tuple[List[Dict[str, Any]], int, float, Dict[str, int], str]:
+        llm = get_chat_model(suggester_model, temperature)
+        try:
+            return (*_request_suggestions(llm, user_prompt, retries), "")
+        except StructuredOutputError as e:
+            return [], e.tokens, 0.0, e.outcome, (
+                f"ERRO na chamada (t={temperature}): {e}"
+            )
+        except Exception as e:
+            return [], 0, 0.0, {}, f"ERRO na chamada (t={temperature}): {e}"
+
+    temperatures = [
+        POPULATION_TEMPERATURES[i % len(POPULATION_TEMPERATURES)]
+        for i in range(calls)
+    ]
+    outcomes = run_ordered(call, temperatures, max_workers=calls)
+
+    seen = {normalize_template(p["template"]) for p in parents}
+    children: list[Dict[str, Any]] = []
+    duplicates = 0
+    for candidates, _, _, _, error in outcomes:
+        if error:
+            new_logs.append(error)
+        for candidate in candidates:
+            if not isinstance(candidate, dict):
+                continue
+            key = normalize_template(candidate.get("template", ""))
+            if not key or key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            children.append(candidate)
+
+    for i, child in enumerate(children[:size]):
+        child["id"] = f"prompt_g{iteration + 1}_{i + 1}"
+    population = children[:size] + parents[: max(0, size - len(children))]
+    new_logs.append(
+        f"   {len(children)} filhos unicos, {duplicates} duplicados "
+        f"descartados, {len(population) - min(len(children), size)} "
+        f"pais mantidos"
+    )
+
+    return (
+        population,
+        sum(outcome[1] for outcome in outcomes),
+        [outcome[2] for outcome in outcomes if not outcome[4]],
+        parse_totals(outcome[3] for outcome in outcomes),
     )
 
-    new_logs.append(">> Analisando resultados e gerando sugestoes...")
 
-    try:
-        response = llm.invoke(
-            [
-                {"role": "system", "content": SUGGESTER_SYSTEM},
-                {"role": "user", "content": user_prompt},
-            ]
+def suggester_node(state: OrchestratorState) -> Dict[str, Any]:
+    """Analyses evaluation scores and proposes improved prompt variations.
+
+    Suggestions come from ``suggester_model`` (default: ``model_name``).
+    With ``population_size`` set, a fixed-size population is evolved
+    instead (see ``_evolve_population``). Responses are constrained to
+    the SuggestionList schema; one that does not parse is retried up to
+    ``parse_retries`` times before falling back.
+
+    Returns new suggestions, the stage timing and log entries.
+    """
+
+    suggester_model = stage_model(state, "suggester_model")
+
+    current_prompts = state["current_prompts"]
+    iteration = state.get("iteration", 0)
+
+    new_logs: list[str] = []
+    new_logs.append("")
+    new_logs.append("=" * 60)
+    new_logs.append(
+        f"AGENTE 2 - SUGESTOR DE PROMPTS  |  Iteracao {iteration + 1}"
+    )
+    new_logs.append("=" * 60)
+
+    if state.get("suggester_context_tokens") and not tokenizer_available(
+        suggester_model
+    ):
+        new_logs.append(
+            "Tokenizador indisponivel: contexto do sugestor medido por "
+            "aproximacao (4 caracteres por token)"
+        )
+
+    if state.get("population_size"):
+        suggestions, tokens, latencies, parse = _evolve_population(
+            state, suggester_model, new_logs
         )
-        response_text = response.content
-
-        # Extract JSON array from response
-        json_start = response_text.find("[")
-        json_end = response_text.rfind("]") + 1
-        if json_start >= 0 and json_end > json_start:
-            json_str = response_text[json_start:json_end]
-            suggestions = json.loads(json_str)
-        else:
-            suggestions = json.loads(response_text)
-
-        # Ensure unique IDs
-        next_id = iteration * 2 + 3
-        for i, suggestion in enumerate(suggestions):
-            suggestion["id"] = f"prompt_v{next_id + i}"
+        for suggestion in suggestions:
             new_logs.append("")
             new_logs.append(f"Sugestao: {suggestion['name']}")
             rationale = suggestion.get("rationale", "")
             new_logs.append(f"   Racional: {rationale[:300]}")
+    else:
+        llm = get_chat_model(suggester_model, SUGGESTER_TEMPERATURE)
+        user_prompt = _build_suggester_prompt(
+            state["evaluation_results"],
+            state.get("feedback_results", []),
+            current_prompts,
+            num_suggestions=DEFAULT_NUM_SUGGESTIONS,
+            context_tokens=state.get("suggester_context_tokens", 0),
+            model=suggester_model,
+        )
+        if state.get("suggester_context_tokens"):
+            new_logs.append(
+                f"Contexto do sugestor: "
+                f"{count_tokens(user_prompt, suggester_model)} tokens"
+            )
+
+        new_logs.append(">> Analisando resultados e gerando sugestoes...")
 
-    except Exception as e:
-        new_logs.append(f"ERRO ao gerar sugestoes: {e}")
-        # Fallback: keep current prompts
-        suggestions = current_prompts
+        tokens = 0
+        latencies = []
+        parse = parse_totals([])
+        try:
+            suggestions, tokens, seconds, parse = _request_suggestions(
+                llm,
+                user_prompt,
+                state.get("parse_retries", DEFAULT_PARSE_RETRIES),
+            )
+            latencies.append(seconds)
+            if parse["repaired"]:
+                new_logs.append("Resposta fora do schema reparada localmente")
+
+            # Ensure unique IDs
+            next_id = iteration * 2 + 3
+            for i, suggestion in enumerate(suggestions):
+                suggestion["id"] = f"prompt_v{next_id + i}"
+                new_logs.append("")
+                new_logs.append(f"Sugestao: {suggestion['name']}")
+                rationale = suggestion.get("rationale", "")
+                new_logs.append(f"   Racional: {rationale[:300]}")
+
+        except Exception as e:
+            if isinstance(e, StructuredOutputError):
+                tokens, parse = e.tokens, e.outcome
+            new_logs.append(f"ERRO ao gerar sugestoes: {e}")
+            # Fallback: keep current prompts
+            suggestions = current_prompts
+
+    timing = stage_timing(
+        iteration,
+        "sugestor",
+        suggester_model,
+        latencies,
+        tokens=tokens,
+        parse=parse,
+    )
+    new_logs.append(timing_log(timing))
 
     return {
         "suggestions": suggestions,
+        "tokens_used": tokens,
+        "stage_timings": [timing],
         "logs": new_logs,
         "status": "suggestions_ready",
     }
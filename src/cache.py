@@ -0,0 +1,141 @@
+"""Persistent on-disk caches for paid LLM calls.
+
+Entries live in a single SQLite file, split by namespace, and are
+content-addressed: the key is a hash of everything that determines the
+LLM output. Each namespace has a TTL and a maximum size; when full, the
+least recently used entries are evicted.
+
+Configuration (environment variables):
+    LLM_CACHE_PATH         SQLite file (default: .cache/llm_cache.sqlite3)
+    LLM_CACHE_TTL_HOURS    entry lifetime in hours (default: 168)
+    LLM_CACHE_MAX_ENTRIES  entries kept per namespace (default: 50000)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_PATH = ".cache/llm_cache.sqlite3"
+DEFAULT_TTL_HOURS = 168.0
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+class DiskCache:
+    """Thread-safe key/value store with TTL and size-bounded LRU eviction."""
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        ttl_seconds: float,
+        max_entries: int,
+    ) -> None:
+        self.path = path
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_lru "
+                "ON entries (namespace, accessed_at)"
+            )
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Returns a stable content hash for the given key parts."""
+
+        payload = json.dumps(
+            parts, ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value, or None when missing or expired."""
+
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries "
+                "WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute(
+                        "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                        (self.namespace, key),
+                    )
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed_at = ? "
+                "WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """Stores a JSON-serialisable value, evicting LRU entries if full."""
+
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(namespace, key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, payload, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key IN ("
+                " SELECT key FROM entries WHERE namespace = ?"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            )
+
+
+_caches: Dict[str, DiskCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str) -> DiskCache:
+    """Returns the process-wide cache for ``namespace``."""
+
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = DiskCache(
+                path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                namespace=namespace,
+                ttl_seconds=float(
+                    os.getenv("LLM_CACHE_TTL_HOURS", DEFAULT_TTL_HOURS)
+                )
+                * 3600,
+                max_entries=int(
+                    os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+                ),
+            )
+        return _caches[namespace]
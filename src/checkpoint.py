@@ -0,0 +1,44 @@
+"""Durable graph checkpoints for resuming interrupted runs.
+
+The compiled graph saves its state to SQLite after every node, keyed by
+the run's ``thread_id`` (the ``run_id``), so a crash or a Streamlit rerun
+resumes from the last finished node instead of starting over. Progress
+inside the evaluator is checkpointed per pair separately (see
+``agents/evaluator.py``).
+
+Configuration (environment variables):
+    CHECKPOINT_PATH   SQLite file (default: .cache/checkpoints.sqlite3)
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+DEFAULT_CHECKPOINT_PATH = ".cache/checkpoints.sqlite3"
+
+_lock = threading.Lock()
+_checkpointer: Optional[SqliteSaver] = None
+
+
+def get_checkpointer() -> SqliteSaver:
+    """Returns the process-wide SQLite checkpointer."""
+
+    global _checkpointer
+    with _lock:
+        if _checkpointer is None:
+            path = os.getenv("CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH)
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            _checkpointer = SqliteSaver(conn)
+        return _checkpointer
+
+
+def run_config(run_id: str) -> Dict[str, Any]:
+    """Graph config that binds an invocation to the run's checkpoints."""
+
+    return {"configurable": {"thread_id": run_id}}
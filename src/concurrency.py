@@ -0,0 +1,27 @@
+"""Bounded-concurrency helpers shared by the agent nodes."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def run_ordered(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    max_workers: int = 1,
+) -> List[R]:
+    """Applies ``fn`` to every item with at most ``max_workers`` in flight.
+
+    Results are returned in input order regardless of completion order, so
+    callers get exactly what the equivalent serial loop would produce.
+    With ``max_workers <= 1`` the items are processed inline.
+    """
+
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(fn, items))
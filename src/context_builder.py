@@ -0,0 +1,272 @@
+"""Compact, token-budgeted context for the suggester.
+
+Instead of one line per evaluation and every full template, the suggester
+context is aggregated per prompt (scores per metric, weakest products),
+per attribute (how often reviewers rejected it) and reduced to the most
+informative negative examples. Each section is filled in priority order
+until its share of the token budget, measured with the model's real
+tokenizer (``tiktoken``), is spent; unused budget flows to the next
+section. If the tokenizer cannot be loaded (its BPE file is downloaded on
+first use), tokens are approximated as CHARS_PER_TOKEN characters each
+and the load is retried after ENCODING_RETRY_SECONDS.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import tiktoken
+
+FALLBACK_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4
+# Share of the budget per section: templates, evaluations, feedback
+SECTION_SHARES = (0.5, 0.2, 0.3)
+WEAKEST_PRODUCTS = 2
+EXAMPLES_PER_PROMPT = 3
+
+
+ENCODING_RETRY_SECONDS = 300.0
+
+# Loaded tokenizers by model; failed loads by model, with their time
+_encodings: Dict[str, tiktoken.Encoding] = {}
+_failed_loads: Dict[str, float] = {}
+
+
+def _encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """``model``'s tokenizer, or None when it cannot be loaded.
+
+    Only successful loads are cached; a failed one is retried once
+    ENCODING_RETRY_SECONDS have passed.
+    """
+
+    encoding = _encodings.get(model)
+    if encoding is not None:
+        return encoding
+    failed_at = _failed_loads.get(model)
+    if (
+        failed_at is not None
+        and time.monotonic() - failed_at < ENCODING_RETRY_SECONDS
+    ):
+        return None
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception:
+        # Network or proxy failure while fetching the BPE file
+        _failed_loads[model] = time.monotonic()
+        return None
+    _failed_loads.pop(model, None)
+    _encodings[model] = encoding
+    return encoding
+
+
+def tokenizer_available(model: str) -> bool:
+    """Whether token counts for ``model`` are exact or approximated."""
+
+    return _encoding(model) is not None
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Number of tokens of ``text`` for ``model``'s tokenizer."""
+
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text: str, budget: int, model: str) -> str:
+    """Cuts ``text`` to its first ``budget`` tokens."""
+
+    encoding = _encoding(model)
+    if encoding is None:
+        if len(text) <= budget * CHARS_PER_TOKEN:
+            return text
+        return text[: budget * CHARS_PER_TOKEN] + " [...]"
+    tokens = encoding.encode(text)
+    if len(tokens) <= budget:
+        return text
+    return encoding.decode(tokens[:budget]) + " [...]"
+
+
+def _fit(lines: List[str], budget: int, model: str) -> Tuple[str, int]:
+    """Joins as many leading lines as fit in ``budget`` tokens.
+
+    The first line is always kept, cut to the budget if needed. Returns
+    the text and the tokens left over.
+    """
+
+    kept: List[str] = []
+    used = 0
+    for line in lines:
+        cost = count_tokens(line + "\n", model)
+        if used + cost > budget:
+            if not kept:
+                kept.append(truncate_to_tokens(line, budget, model))
+                used = budget
+            else:
+                kept.append("[...]")
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept), budget - used
+
+
+def _prompt_stats(
+    evaluation_results: List[Dict[str, Any]],
+) -> Dict[str, Dict[str, Any]]:
+    """Per prompt id: average score, per-metric averages, weakest products.
+
+    Partial results of prompts pruned by racing are left out.
+    """
+
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for r in evaluation_results:
+        if r.get("partial"):
+            continue
+        groups.setdefault(r["prompt_id"], []).append(r)
+
+    stats: Dict[str, Dict[str, Any]] = {}
+    for pid, results in groups.items():
+        metric_scores: Dict[str, List[float]] = {}
+        for r in results:
+            for name, data in r["metrics"].items():
+                if isinstance(data["score"], (int, float)):
+                    metric_scores.setdefault(name, []).append(data["score"])
+        stats[pid] = {
+            "name": results[0]["prompt_name"],
+            "avg_score": sum(r["avg_score"] for r in results) / len(results),
+            "products": len(results),
+            "metrics": {
+                name: sum(s) / len(s) for name, s in metric_scores.items()
+            },
+            "weakest": sorted(results, key=lambda r: r["avg_score"])[
+                :WEAKEST_PRODUCTS
+            ],
+        }
+    return stats
+
+
+def _attribute_rejections(
+    feedback_results: List[Dict[str, Any]],
+) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """Negative feedback items grouped by prompt id, then by attribute."""
+
+    rejections: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    for fb in feedback_results:
+        for item in fb.get("feedbacks", []):
+            if item.get("veredicto") != "negativo":
+                continue
+            by_attribute = rejections.setdefault(fb["prompt_id"], {})
+            by_attribute.setdefault(item.get("atributo", "?"), []).append(
+                {**item, "product_name": fb["product_name"]}
+            )
+    return rejections
+
+
+def select_negative_examples(
+    by_attribute: Dict[str, List[Dict[str, Any]]], limit: int
+) -> List[Dict[str, Any]]:
+    """Most informative negative items: one per attribute, most frequently
+    rejected attributes first, preferring items that explain the reason."""
+
+    ranked = sorted(by_attribute.values(), key=len, reverse=True)
+    return [
+        max(items, key=lambda item: len(item.get("motivo", "")))
+        for items in ranked[:limit]
+    ]
+
+
+def build_suggester_context(
+    evaluation_results: List[Dict[str, Any]],
+    feedback_results: List[Dict[str, Any]],
+    prompts: List[Dict[str, Any]],
+    budget: int,
+    model: str,
+) -> Tuple[str, str, str]:
+    """Returns the evaluation, feedback and prompts sections within
+    ``budget`` tokens in total."""
+
+    stats = _prompt_stats(evaluation_results)
+    rejections = _attribute_rejections(feedback_results)
+    ranked_prompts = sorted(
+        prompts,
+        key=lambda p: stats.get(p["id"], {}).get("avg_score", 0.0),
+        reverse=True,
+    )
+
+    # Templates, best-scoring prompts first
+    prompt_lines: List[str] = []
+    for p in ranked_prompts:
+        prompt_lines.append(
+            f"### {p['name']} (ID: {p['id']})\n"
+            f"Racional: {p.get('rationale', 'N/A')}\n"
+            f"Template:\n```\n{p['template']}\n```\n"
+        )
+
+    eval_lines: List[str] = []
+    for p in ranked_prompts:
+        s = stats.get(p["id"])
+        if s is None:
+            continue
+        metrics_str = ", ".join(
+            f"{name}: {score:.2f}" for name, score in s["metrics"].items()
+        )
+        eval_lines.append(
+            f"- {s['name']}: Score medio={s['avg_score']:.2f} em "
+            f"{s['products']} produtos | {metrics_str}"
+        )
+        weakest = ", ".join(
+            f"{r['product_name']} ({r['avg_score']:.2f})"
+            for r in s["weakest"]
+        )
+        eval_lines.append(f"  Piores produtos: {weakest}")
+
+    fb_lines: List[str] = []
+    for p in ranked_prompts:
+        prompt_fbs = [
+            fb for fb in feedback_results if fb["prompt_id"] == p["id"]
+        ]
+        if not prompt_fbs:
+            continue
+        by_attribute = rejections.get(p["id"], {})
+        fb_lines.append(
+            f"- {p['name']}: "
+            f"+{sum(fb['positivos'] for fb in prompt_fbs)} positivos / "
+            f"-{sum(fb['negativos'] for fb in prompt_fbs)} negativos"
+        )
+        if by_attribute:
+            fb_lines.append(
+                "  Atributos mais rejeitados: "
+                + ", ".join(
+                    f"{attr} ({len(items)}x)"
+                    for attr, items in sorted(
+                        by_attribute.items(),
+                        key=lambda kv: len(kv[1]),
+                        reverse=True,
+                    )
+                )
+            )
+        for item in select_negative_examples(
+            by_attribute, EXAMPLES_PER_PROMPT
+        ):
+            fb_lines.append(
+                f"  NEGATIVO ({item['product_name']}): atributo "
+                f"'{item.get('atributo', '?')}' = "
+                f"'{item.get('valor_gerado', '?')}' — "
+                f"{item.get('motivo', '')}"
+            )
+
+    prompts_share, eval_share, fb_share = (
+        int(budget * share) for share in SECTION_SHARES
+    )
+    prompts_summary, left = _fit(prompt_lines, prompts_share, model)
+    evaluation_summary, left = _fit(eval_lines, eval_share + left, model)
+    feedback_summary, _ = _fit(fb_lines, fb_share + left, model)
+
+    return (
+        evaluation_summary,
+        feedback_summary or "Nenhum feedback disponivel.",
+        prompts_summary,
+    )
@@ -0,0 +1,68 @@
+"""Stopping policy for the optimization loop."""
+
+from typing import Any, Dict, List, Optional
+
+from .state import OrchestratorState
+
+
+def iteration_best_score(evaluation_results: List[Dict[str, Any]]) -> float:
+    """Returns the best per-prompt average score of one iteration.
+
+    Partial results of prompts pruned by a racing evaluation are ignored,
+    since they only cover a subset of the products.
+    """
+
+    prompt_scores: Dict[str, List[float]] = {}
+    for r in evaluation_results:
+        if r.get("partial"):
+            continue
+        prompt_scores.setdefault(r["prompt_id"], []).append(r["avg_score"])
+    if not prompt_scores:
+        return 0.0
+    return max(sum(s) / len(s) for s in prompt_scores.values())
+
+
+def check_convergence(
+    state: OrchestratorState, best_scores: List[float]
+) -> Optional[str]:
+    """Decides whether the loop should stop before max_iterations.
+
+    ``best_scores`` holds the best prompt score of every finished
+    iteration, oldest first. Policy settings are read from state and each
+    one is disabled when unset or zero:
+
+        - target_score: stop once an iteration reaches this score
+        - min_delta / patience: stop when the best score improved by less
+          than min_delta over the last ``patience`` iterations
+        - token_budget: stop once tokens_used reaches the budget
+
+    Returns a human-readable stop reason, or None to keep going.
+    """
+
+    target_score = state.get("target_score") or 0.0
+    min_delta = state.get("min_delta") or 0.0
+    patience = state.get("patience") or 0
+    token_budget = state.get("token_budget") or 0
+    tokens_used = state.get("tokens_used", 0)
+
+    if best_scores and target_score and best_scores[-1] >= target_score:
+        return (
+            f"Score alvo atingido ({best_scores[-1]:.2f} >= "
+            f"{target_score:.2f})"
+        )
+
+    if min_delta and patience and len(best_scores) > patience:
+        baseline = max(best_scores[:-patience])
+        improvement = max(best_scores[-patience:]) - baseline
+        if improvement < min_delta:
+            return (
+                f"Convergencia: melhoria de {improvement:+.3f} nas ultimas "
+                f"{patience} iteracoes (minimo {min_delta:.3f})"
+            )
+
+    if token_budget and tokens_used >= token_budget:
+        return (
+            f"Orcamento de tokens esgotado ({tokens_used} / {token_budget})"
+        )
+
+    return None
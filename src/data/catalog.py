@@ -0,0 +1,205 @@
+"""Streaming product catalog: JSONL / CSV / Parquet input, sampling, sharding.
+
+Products are read lazily and validated one at a time, so catalogs with
+hundreds of thousands of SKUs never need to be held in memory (or in graph
+state). A catalog is described in state by a spec dict:
+
+    {
+        "path": "catalog.jsonl",   # .jsonl, .csv or .parquet
+        "sample_size": 500,        # optional, stratified by category
+        "shard_index": 0,          # optional, with shard_count
+        "shard_count": 4,
+        "seed": 42,                # optional, sampling seed (default 0)
+    }
+
+CSV files store ``attributes`` and ``expected_attributes`` as JSON strings.
+Parquet support needs the optional ``pyarrow`` package.
+"""
+
+import csv
+import json
+import random
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from ..state import OrchestratorState
+from .store import resolve_products
+
+PARQUET_BATCH_SIZE = 1024
+
+
+class Product(BaseModel):
+    """Schema every catalog row must satisfy."""
+
+    name: str
+    category: str
+    description: str
+    brand: str
+    attributes: Dict[str, Any] = {}
+    expected_attributes: Dict[str, Any] = {}
+    id: Optional[str] = None
+
+
+def _iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_csv(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            for field in ("attributes", "expected_attributes"):
+                if row.get(field):
+                    row[field] = json.loads(row[field])
+                else:
+                    row.pop(field, None)
+            yield row
+
+
+def _iter_parquet(path: str) -> Iterator[Dict[str, Any]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            "Leitura de Parquet requer o pacote opcional 'pyarrow'"
+        ) from e
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_SIZE):
+        for row in batch.to_pylist():
+            for field in ("attributes", "expected_attributes"):
+                if isinstance(row.get(field), str):
+                    row[field] = json.loads(row[field])
+            yield row
+
+
+_READERS = {
+    "jsonl": _iter_jsonl,
+    "csv": _iter_csv,
+    "parquet": _iter_parquet,
+}
+
+
+def iter_products(path: str) -> Iterator[Dict[str, Any]]:
+    """Lazily yields validated product dicts from a catalog file.
+
+    Raises ValueError naming the offending row when a product does not
+    match the ``Product`` schema.
+    """
+
+    fmt = path.rsplit(".", 1)[-1].lower()
+    if fmt not in _READERS:
+        raise ValueError(
+            f"Formato de catalogo nao suportado: '{fmt}' "
+            f"(use {', '.join(_READERS)})"
+        )
+
+    for row_num, row in enumerate(_READERS[fmt](path), 1):
+        try:
+            product = Product.model_validate(row)
+        except ValidationError as e:
+            raise ValueError(
+                f"Produto invalido na linha {row_num} de {path}: {e}"
+            ) from e
+        yield product.model_dump(exclude_none=True)
+
+
+def shard(
+    products: Iterable[Dict[str, Any]], index: int, count: int
+) -> Iterator[Dict[str, Any]]:
+    """Yields every ``count``-th product starting at ``index``."""
+
+    return islice(products, index, None, count)
+
+
+def stratified_sample(
+    products: Iterable[Dict[str, Any]],
+    size: int,
+    by: str = "category",
+    seed: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Single-pass stratified sample of ``size`` products.
+
+    Keeps one reservoir of at most ``size`` products per stratum, then
+    allocates the sample across strata in proportion to their observed
+    counts (every stratum gets at least one slot while slots remain).
+    Memory is bounded by strata x size, not by catalog size.
+    """
+
+    rng = random.Random(seed)
+    reservoirs: Dict[str, List[Dict[str, Any]]] = {}
+    counts: Dict[str, int] = {}
+
+    for product in products:
+        key = product.get(by, "")
+        seen = counts.get(key, 0) + 1
+        counts[key] = seen
+        reservoir = reservoirs.setdefault(key, [])
+        if len(reservoir) < size:
+            reservoir.append(product)
+        else:
+            j = rng.randrange(seen)
+            if j < size:
+                reservoir[j] = product
+
+    total = sum(counts.values())
+    if total <= size:
+        return [p for reservoir in reservoirs.values() for p in reservoir]
+
+    # Largest-remainder allocation, at least one slot per stratum
+    quotas = {k: size * c / total for k, c in counts.items()}
+    alloc = {k: max(1, int(q)) for k, q in quotas.items()}
+    by_remainder = sorted(
+        quotas, key=lambda k: quotas[k] - int(quotas[k]), reverse=True
+    )
+    while sum(alloc.values()) < size:
+        for k in by_remainder:
+            if sum(alloc.values()) >= size:
+                break
+            if alloc[k] < len(reservoirs[k]):
+                alloc[k] += 1
+    while sum(alloc.values()) > size:
+        k = max(alloc, key=lambda k: alloc[k])
+        alloc[k] -= 1
+
+    sample: List[Dict[str, Any]] = []
+    for k, reservoir in reservoirs.items():
+        sample.extend(rng.sample(reservoir, min(alloc[k], len(reservoir))))
+    return sample
+
+
+def load_catalog(spec: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    """Builds the product stream described by a catalog spec."""
+
+    products: Iterable[Dict[str, Any]] = iter_products(spec["path"])
+    if spec.get("shard_count", 1) > 1:
+        products = shard(
+            products, spec.get("shard_index", 0), spec["shard_count"]
+        )
+    if spec.get("sample_size"):
+        # A fixed default seed keeps the sample identical every time the
+        # stream is rebuilt (the evaluator and feedback nodes both read it).
+        products = stratified_sample(
+            products, spec["sample_size"], seed=spec.get("seed", 0)
+        )
+    return products
+
+
+def iter_state_products(
+    state: OrchestratorState,
+) -> Iterable[Dict[str, Any]]:
+    """Returns the products of a run, lazily where possible.
+
+    Sources, in order: ``product_ids`` resolved from the shared product
+    store, the ``catalog`` stream, then the legacy ``products`` list.
+    """
+
+    if state.get("product_ids"):
+        return resolve_products(state["product_ids"])
+    if state.get("catalog"):
+        return load_catalog(state["catalog"])
+    return state.get("products", [])
@@ -0,0 +1,49 @@
+"""Shared read-only product store.
+
+Graph state is copied (and checkpointed) at every node step, so it carries
+compact product IDs instead of full product dicts. The dicts are interned
+once per process in this store and resolved by the nodes on demand.
+Stored products are read-only mapping proxies; nodes must not mutate them.
+"""
+
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, List, Mapping
+
+_lock = threading.Lock()
+_products: Dict[str, Mapping[str, Any]] = {}
+
+
+def product_id(product: Mapping[str, Any]) -> str:
+    """Returns a product's ID: its ``id`` field, falling back to its name."""
+
+    return str(product.get("id") or product["name"])
+
+
+def register_products(products: Iterable[Dict[str, Any]]) -> List[str]:
+    """Interns products in the store and returns their IDs, in order.
+
+    Re-registering an ID replaces the stored product.
+    """
+
+    ids: List[str] = []
+    with _lock:
+        for product in products:
+            pid = product_id(product)
+            _products[pid] = MappingProxyType(dict(product))
+            ids.append(pid)
+    return ids
+
+
+def get_product(pid: str) -> Mapping[str, Any]:
+    """Returns the stored product; raises KeyError if it was never
+    registered in this process."""
+
+    return _products[pid]
+
+
+def resolve_products(ids: Iterable[str]) -> Iterator[Mapping[str, Any]]:
+    """Lazily yields the stored products for ``ids``."""
+
+    for pid in ids:
+        yield _products[pid]
@@ -0,0 +1,247 @@
+"""Offline attribute-level scorer: enriched outputs vs expected attributes.
+
+Complements the LLM-judged metrics in ``metrics.py`` with a reproducible,
+near-free precision/recall signal. Values are normalised (decimal commas,
+units such as ``"`` / ``polegadas``, spacing, accents) and keys are matched
+fuzzily, then per-attribute exact and partial matches for every
+prompt x product pair are laid out as NumPy matrices so aggregates over
+thousands of SKUs are single array operations.
+"""
+
+import difflib
+import json
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+KEY_MATCH_CUTOFF = 0.8
+
+# Unit spellings folded onto one canonical token
+UNIT_ALIASES = {
+    '"': "in",
+    "''": "in",
+    "pol": "in",
+    "polegada": "in",
+    "polegadas": "in",
+    "watts": "w",
+    "watt": "w",
+    "volts": "v",
+    "litros": "l",
+    "litro": "l",
+    "gramas": "g",
+    "quilos": "kg",
+    "segundos": "s",
+}
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_UNIT_RE = re.compile(
+    r"(\d)\s*(" + "|".join(
+        re.escape(u) for u in sorted(UNIT_ALIASES, key=len, reverse=True)
+    ) + r")(?![a-z])"
+)
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(
+        c
+        for c in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(c)
+    )
+
+
+def normalize_key(key: str) -> str:
+    """Lowercase, accent-free snake_case version of an attribute key."""
+
+    key = _strip_accents(str(key)).lower()
+    return re.sub(r"[^a-z0-9]+", "_", key).strip("_")
+
+
+def normalize_value(value: Any) -> str:
+    """Canonical form of an attribute value for comparison.
+
+    ``6,2"``, ``6.2 polegadas`` and ``6.2 pol`` all become ``6.2in``;
+    ``1260 W`` and ``1260W`` both become ``1260w``.
+    """
+
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False)
+    text = _strip_accents(value).lower().strip()
+    text = re.sub(r"(\d),(\d)", r"\1.\2", text)
+    text = _UNIT_RE.sub(lambda m: m.group(1) + UNIT_ALIASES[m.group(2)], text)
+    text = re.sub(r"(\d)\s+([a-z])", r"\1\2", text)
+    return re.sub(r"\s+", " ", text)
+
+
+def partial_similarity(a: str, b: str) -> float:
+    """Similarity in [0, 1] between two normalised values.
+
+    The larger of token Jaccard similarity and the overlap of the numbers
+    both values mention.
+    """
+
+    tokens_a, tokens_b = set(a.split()), set(b.split())
+    jaccard = (
+        len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+        if tokens_a | tokens_b
+        else 0.0
+    )
+    nums_a, nums_b = set(_NUMBER_RE.findall(a)), set(_NUMBER_RE.findall(b))
+    numeric = (
+        len(nums_a & nums_b) / len(nums_a | nums_b)
+        if nums_a and nums_b
+        else 0.0
+    )
+    return max(jaccard, numeric)
+
+
+def match_keys(
+    output_keys: List[str], expected_keys: List[str]
+) -> Dict[str, str]:
+    """Maps each expected key to an output key, exact first then fuzzy."""
+
+    by_norm = {normalize_key(k): k for k in output_keys}
+    mapping: Dict[str, str] = {}
+    unmatched: List[str] = []
+    for key in expected_keys:
+        norm = normalize_key(key)
+        if norm in by_norm:
+            mapping[key] = by_norm.pop(norm)
+        else:
+            unmatched.append(key)
+
+    for key in unmatched:
+        close = difflib.get_close_matches(
+            normalize_key(key), list(by_norm), n=1, cutoff=KEY_MATCH_CUTOFF
+        )
+        if close:
+            mapping[key] = by_norm.pop(close[0])
+    return mapping
+
+
+def _parse_output(enriched_output: str) -> Dict[str, Any]:
+    start = enriched_output.find("{")
+    end = enriched_output.rfind("}") + 1
+    try:
+        parsed = json.loads(enriched_output[start:end])
+    except (json.JSONDecodeError, ValueError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+@dataclass
+class AttributeScores:
+    """Per-attribute match matrices for a set of prompt x product pairs.
+
+    Rows follow ``pairs``; columns follow ``attributes`` (the union of the
+    expected keys of every product).
+
+        expected: attribute is part of the product's ground truth
+        present:  an output key was matched to the attribute
+        exact:    normalised values are identical
+        partial:  value similarity in [0, 1] (1.0 on exact matches)
+        output_keys: number of keys in each parsed output
+    """
+
+    pairs: List[Tuple[str, str]]
+    attributes: List[str]
+    expected: np.ndarray
+    present: np.ndarray
+    exact: np.ndarray
+    partial: np.ndarray
+    output_keys: np.ndarray
+
+    def recall(self) -> np.ndarray:
+        """Share of expected attributes found, per pair."""
+        return self.present.sum(axis=1) / np.maximum(
+            self.expected.sum(axis=1), 1
+        )
+
+    def precision(self) -> np.ndarray:
+        """Share of output keys that map to an expected attribute."""
+        return self.present.sum(axis=1) / np.maximum(self.output_keys, 1)
+
+    def value_accuracy(self) -> np.ndarray:
+        """Mean partial value similarity over the found attributes."""
+        return (self.partial * self.present).sum(axis=1) / np.maximum(
+            self.present.sum(axis=1), 1
+        )
+
+    def per_prompt(self) -> Dict[str, Dict[str, float]]:
+        """Averages recall, precision and value accuracy per prompt id."""
+
+        prompt_ids = np.array([p for p, _ in self.pairs])
+        recall = self.recall()
+        precision = self.precision()
+        accuracy = self.value_accuracy()
+        summary: Dict[str, Dict[str, float]] = {}
+        for pid in dict.fromkeys(prompt_ids.tolist()):
+            rows = prompt_ids == pid
+            summary[pid] = {
+                "recall": float(recall[rows].mean()),
+                "precision": float(precision[rows].mean()),
+                "value_accuracy": float(accuracy[rows].mean()),
+            }
+        return summary
+
+
+def score_attributes(
+    evaluation_results: List[Dict[str, Any]],
+    products: List[Dict[str, Any]],
+    attributes: Optional[List[str]] = None,
+) -> AttributeScores:
+    """Builds the match matrices for every evaluation result at once."""
+
+    product_map = {p["name"]: p for p in products}
+    if attributes is None:
+        attributes = list(
+            dict.fromkeys(
+                key
+                for p in products
+                for key in p.get("expected_attributes", {})
+            )
+        )
+    column = {key: j for j, key in enumerate(attributes)}
+
+    shape = (len(evaluation_results), len(attributes))
+    expected = np.zeros(shape, dtype=bool)
+    present = np.zeros(shape, dtype=bool)
+    exact = np.zeros(shape, dtype=bool)
+    partial = np.zeros(shape, dtype=float)
+    output_keys = np.zeros(len(evaluation_results), dtype=int)
+    pairs: List[Tuple[str, str]] = []
+
+    for i, result in enumerate(evaluation_results):
+        pairs.append((result["prompt_id"], result["product_name"]))
+        truth = product_map.get(result["product_name"], {}).get(
+            "expected_attributes", {}
+        )
+        output = _parse_output(result.get("enriched_output", ""))
+        output_keys[i] = len(output)
+
+        for key, out_key in match_keys(list(output), list(truth)).items():
+            j = column.get(key)
+            if j is None:
+                continue
+            want = normalize_value(truth[key])
+            got = normalize_value(output[out_key])
+            present[i, j] = True
+            exact[i, j] = want == got
+            partial[i, j] = 1.0 if want == got else partial_similarity(
+                want, got
+            )
+        for key in truth:
+            if key in column:
+                expected[i, column[key]] = True
+
+    return AttributeScores(
+        pairs=pairs,
+        attributes=attributes,
+        expected=expected,
+        present=present,
+        exact=exact,
+        partial=partial,
+        output_keys=output_keys,
+    )
@@ -1,21 +1,30 @@
 """DeepEval metrics for product attribute enrichment evaluation."""
 
-from deepeval.metrics import GEval
-from deepeval.test_case import LLMTestCaseParams
-
+import copy
+import functools
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Optional
 
-def get_evaluation_metrics(model: str = "gpt-4o-mini") -> list:
-    """Returns DeepEval metrics tailored for product attribute enrichment.
+from deepeval.metrics import GEval
+from deepeval.models import GPTModel
+from deepeval.test_case import LLMTestCase, LLMTestCaseParams
+from pydantic import create_model
 
-    Metrics:
-        - Completude: how many expected attributes were captured
-        - Precisão: correctness of attribute values
-        - Formato: JSON quality and key naming consistency
-    """
+from ..cache import get_cache
+from ..llm import get_chat_model
+from ..structured_output import (
+    CriterionVerdict,
+    StructuredOutputError,
+    invoke_structured,
+)
 
-    completeness = GEval(
-        name="Completude",
-        criteria=(
+CRITERIA = [
+    (
+        "Completude",
+        (
             "Avalie a completude do enriquecimento de atributos do produto. "
             "Compare os atributos gerados (actual output) com os atributos "
             "esperados (expected output). Considere: "
@@ -23,17 +32,15 @@ def get_evaluation_metrics(model: str = "gpt-4o-mini") -> list:
             "2) Os atributos adicionais são relevantes para a categoria? "
             "3) Há atributos importantes faltando?"
         ),
-        evaluation_params=[
+        [
             LLMTestCaseParams.INPUT,
             LLMTestCaseParams.ACTUAL_OUTPUT,
             LLMTestCaseParams.EXPECTED_OUTPUT,
         ],
-        model=model,
-    )
-
-    accuracy = GEval(
-        name="Precisão",
-        criteria=(
+    ),
+    (
+        "Precisão",
+        (
             "Avalie a precisão dos atributos enriquecidos do produto. "
             "Compare os valores gerados com os valores esperados. Considere: "
             "1) Os valores dos atributos estão corretos? "
@@ -41,17 +48,15 @@ def get_evaluation_metrics(model: str = "gpt-4o-mini") -> list:
             "3) Os valores são realistas para o produto? "
             "4) Há informações inventadas ou alucinadas?"
         ),
-        evaluation_params=[
+        [
             LLMTestCaseParams.INPUT,
             LLMTestCaseParams.ACTUAL_OUTPUT,
             LLMTestCaseParams.EXPECTED_OUTPUT,
         ],
-        model=model,
-    )
-
-    format_quality = GEval(
-        name="Formato",
-        criteria=(
+    ),
+    (
+        "Formato",
+        (
             "Avalie a qualidade do formato dos atributos enriquecidos. "
             "Considere: "
             "1) A saída é um JSON válido e bem estruturado? "
@@ -59,11 +64,360 @@ def get_evaluation_metrics(model: str = "gpt-4o-mini") -> list:
             "3) Os valores estão formatados de maneira padronizada? "
             "4) O formato facilita o uso em um sistema de e-commerce?"
         ),
-        evaluation_params=[
+        [
             LLMTestCaseParams.INPUT,
             LLMTestCaseParams.ACTUAL_OUTPUT,
         ],
-        model=model,
+    ),
+]
+
+COMBINED_JUDGE_TEMPLATE = """Voce e um avaliador rigoroso de enriquecimento de fichas tecnicas de produtos.
+Avalie o output gerado segundo CADA um dos criterios abaixo, de forma independente.
+
+## Criterios
+{criteria}
+
+## Input (prompt enviado ao LLM)
+{input}
+
+## Actual output (atributos gerados)
+{actual_output}
+
+## Expected output (atributos esperados)
+{expected_output}
+
+Para cada criterio, de uma nota inteira de 0 a 10 e uma justificativa curta.
+Responda APENAS com um JSON valido no formato:
+{
+    "Completude": {"score": <0-10>, "reason": "<justificativa>"},
+    "Precisão": {"score": <0-10>, "reason": "<justificativa>"},
+    "Formato": {"score": <0-10>, "reason": "<justificativa>"}
+}"""
+
+# Combined judge response: one {score, reason} field per criterion
+CombinedVerdict = create_model(
+    "CombinedVerdict",
+    **{name: (CriterionVerdict, ...) for name, _, _ in CRITERIA},
+)
+
+# Judge tokens spent by the metrics measured in the current thread
+_judge_usage = threading.local()
+
+
+def reset_judge_tokens() -> None:
+    """Starts a new judge token count for the current thread."""
+
+    _judge_usage.tokens = 0
+
+
+def judge_tokens() -> int:
+    """Judge tokens spent in the current thread since the last reset."""
+
+    return getattr(_judge_usage, "tokens", 0)
+
+
+def _add_judge_tokens(tokens: int) -> None:
+    _judge_usage.tokens = judge_tokens() + tokens
+
+
+class TrackedGPTModel(GPTModel):
+    """DeepEval's native OpenAI judge, recording the tokens it spends.
+
+    DeepEval prices every completion from its real usage through
+    ``calculate_cost``; the usage is recorded there, so GEval keeps its
+    native (logprob-weighted) scoring.
+    """
+
+    def calculate_cost(self, input_tokens: int, output_tokens: int) -> float:
+        _add_judge_tokens(input_tokens + output_tokens)
+        return super().calculate_cost(input_tokens, output_tokens)
+
+
+SNAKE_CASE_RE = re.compile(r"^[a-z0-9]+(_[a-z0-9]+)*$")
+
+
+def compute_local_metrics(
+    actual_output: str, expected_attributes: Dict[str, Any]
+) -> Dict[str, float]:
+    """Cheap deterministic checks on an enriched output, no LLM involved.
+
+    Returns:
+        - json_valid: 1.0 when the output (markdown fences allowed) is a
+          JSON object
+        - key_recall: share of expected keys present in the output
+        - key_precision: share of output keys that are expected keys
+        - snake_case: share of output keys in snake_case
+        - local_score: mean of the four values above
+    """
+
+    text = actual_output.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1:] if "\n" in text else ""
+
+    try:
+        parsed = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        parsed = None
+
+    if not isinstance(parsed, dict) or not parsed:
+        return {
+            "json_valid": float(isinstance(parsed, dict)),
+            "key_recall": 0.0,
+            "key_precision": 0.0,
+            "snake_case": 0.0,
+            "local_score": float(isinstance(parsed, dict)) / 4,
+        }
+
+    keys = set(parsed)
+    expected = set(expected_attributes)
+    matched = len(keys & expected)
+    local = {
+        "json_valid": 1.0,
+        "key_recall": matched / len(expected) if expected else 1.0,
+        "key_precision": matched / len(keys),
+        "snake_case": sum(bool(SNAKE_CASE_RE.match(k)) for k in keys)
+        / len(keys),
+    }
+    local["local_score"] = sum(local.values()) / len(local)
+    return local
+
+
+def local_metric_results(
+    local: Dict[str, float], threshold: float
+) -> Dict[str, Dict[str, Any]]:
+    """Maps local metrics onto the CRITERIA names for a skipped judge call.
+
+    Completude uses key recall, Precisão key precision and Formato JSON
+    validity times snake_case conformance.
+    """
+
+    reason = (
+        f"Pontuacao local (score local {local['local_score']:.2f} "
+        f"< limiar {threshold:.2f}); juiz LLM nao executado"
+    )
+    scores = {
+        "Completude": local["key_recall"],
+        "Precisão": local["key_precision"],
+        "Formato": local["json_valid"] * local["snake_case"],
+    }
+    return {
+        name: {"score": scores[name], "reason": reason}
+        for name, _, _ in CRITERIA
+    }
+
+
+class StepCachingGEval(GEval):
+    """GEval that persists its generated evaluation steps.
+
+    DeepEval derives evaluation steps from the criteria text with an extra
+    LLM call the first time a metric is measured. Steps are stored in the
+    on-disk cache keyed by judge model, metric name and criteria, and are
+    passed back to GEval on construction so later processes skip that
+    call. Shallow copies (used for thread-safe measurement) share a holder,
+    so steps generated by one copy are reused by the others; until steps
+    exist, measurements are serialised on the holder's lock, so concurrent
+    first measurements wait for one set of steps instead of each
+    generating its own rubric.
+    """
+
+    def __init__(self, name: str, criteria: str, model: str, **kwargs):
+        cache = get_cache("geval_steps")
+        steps_key = cache.make_key(model, name, criteria)
+        steps = cache.get(steps_key)
+        super().__init__(
+            name=name,
+            criteria=criteria,
+            evaluation_steps=steps,
+            model=TrackedGPTModel(model=model),
+            **kwargs,
+        )
+        self._steps_key = steps_key
+        self._steps_holder = {"steps": steps, "lock": threading.Lock()}
+
+    def measure(self, test_case: LLMTestCase, *args, **kwargs) -> float:
+        holder = self._steps_holder
+        if not holder["steps"]:
+            with holder["lock"]:
+                if not holder["steps"]:
+                    score = super().measure(test_case, *args, **kwargs)
+                    if self.evaluation_steps:
+                        holder["steps"] = list(self.evaluation_steps)
+                        get_cache("geval_steps").set(
+                            self._steps_key, holder["steps"]
+                        )
+                    return score
+        if not self.evaluation_steps:
+            self.evaluation_steps = holder["steps"]
+        return super().measure(test_case, *args, **kwargs)
+
+
+class MemoizedMetric:
+    """Wraps a metric and memoizes its judgments on disk.
+
+    Judgments are keyed on the judge model, the metric name and criteria
+    text, and the test case input, actual output and expected output, so
+    editing the criteria or switching judges invalidates old entries.
+    """
+
+    def __init__(self, metric: Any, model: str) -> None:
+        self.metric = metric
+        self.name = metric.name
+        self.criteria_names = getattr(metric, "criteria_names", None)
+        self.model = model
+        self.score: Any = None
+        self.reason: Any = None
+        self.results: Optional[Dict[str, Dict[str, Any]]] = None
+        self.cache_hit = False
+
+    def measure(self, test_case: LLMTestCase) -> float:
+        cache = get_cache("judge")
+        key = cache.make_key(
+            self.model,
+            self.name,
+            self.metric.criteria,
+            test_case.input,
+            test_case.actual_output,
+            test_case.expected_output,
+        )
+
+        cached = cache.get(key)
+        if cached is not None:
+            self.score = cached["score"]
+            self.reason = cached["reason"]
+            self.results = cached.get("results")
+            self.cache_hit = True
+            return self.score
+
+        # The wrapped metric is shared; measure a private copy of it.
+        metric = copy.copy(self.metric)
+        metric.measure(test_case)
+        self.score = metric.score
+        self.reason = metric.reason
+        self.results = getattr(metric, "results", None)
+        self.cache_hit = False
+        cache.set(
+            key,
+            {
+                "score": self.score,
+                "reason": self.reason,
+                "results": self.results,
+            },
+        )
+        return self.score
+
+
+class CombinedJudgeMetric:
+    """Scores every criterion in CRITERIA with a single judge call.
+
+    The three GEval metrics each resend the full input, actual output and
+    expected output (and derive their own evaluation steps), tripling the
+    judge tokens per pair. This metric asks for all criteria at once and
+    exposes the per-criterion outcome in ``results`` using the same
+    ``{"score", "reason"}`` shape, with scores normalised to 0-1. The
+    response is constrained to the CombinedVerdict schema, so a missing
+    criterion is retried instead of surfacing as a KeyError.
+    """
+
+    name = "Juiz combinado"
+    criteria_names = [name for name, _, _ in CRITERIA]
+
+    def __init__(self, model: str) -> None:
+        self.model = model
+        self.criteria = "\n".join(
+            f"{name}: {criteria}" for name, criteria, _ in CRITERIA
+        )
+        self.score: Any = None
+        self.reason: Any = None
+        self.results: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def measure(self, test_case: LLMTestCase) -> float:
+        criteria_text = "\n".join(
+            f"- {name}: {criteria}" for name, criteria, _ in CRITERIA
+        )
+        prompt = COMBINED_JUDGE_TEMPLATE.replace(
+            "{criteria}", criteria_text
+        ).replace(
+            "{input}", test_case.input
+        ).replace(
+            "{actual_output}", test_case.actual_output
+        ).replace(
+            "{expected_output}", test_case.expected_output or ""
+        )
+
+        llm = get_chat_model(self.model, 0.0)
+        try:
+            verdict, tokens, _ = invoke_structured(
+                llm, [{"role": "user", "content": prompt}], CombinedVerdict
+            )
+        except StructuredOutputError as e:
+            _add_judge_tokens(e.tokens)
+            raise
+        _add_judge_tokens(tokens)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for name, _, _ in CRITERIA:
+            item = getattr(verdict, name)
+            score = min(max(item.score / 10, 0.0), 1.0)
+            results[name] = {"score": score, "reason": item.reason}
+
+        self.results = results
+        self.score = sum(r["score"] for r in results.values()) / len(results)
+        self.reason = "; ".join(
+            f"{name}: {r['reason']}" for name, r in results.items()
+        )
+        return self.score
+
+
+def get_evaluation_metrics(
+    model: str = "gpt-4o-mini",
+    memoize: bool = False,
+    combined: bool = False,
+) -> list:
+    """Returns DeepEval metrics tailored for product attribute enrichment.
+
+    Metrics:
+        - Completude: how many expected attributes were captured
+        - Precisão: correctness of attribute values
+        - Formato: JSON quality and key naming consistency
+
+    With ``combined=True`` a single CombinedJudgeMetric scores all three
+    criteria in one judge call. With ``memoize=True`` each metric is
+    wrapped in a MemoizedMetric, so unchanged outputs are scored from the
+    on-disk judge cache. Every metric records the judge tokens it spends
+    in the measuring thread (see ``judge_tokens``).
+
+    Metrics are built once per process for each argument combination and
+    API key (like ``get_chat_model``, so a key entered later in the UI is
+    not shadowed by metrics built with an older one) and shared; callers
+    must measure shallow copies (see evaluator) rather than the returned
+    instances.
+    """
+
+    return _build_metrics(
+        model, memoize, combined, os.getenv("OPENAI_API_KEY", "")
     )
 
-    return [completeness, accuracy, format_quality]
+
+@functools.lru_cache(maxsize=None)
+def _build_metrics(
+    model: str, memoize: bool, combined: bool, api_key: str
+) -> list:
+    """Builds the metric list; ``api_key`` only keys the cache."""
+
+    if combined:
+        metrics: list = [CombinedJudgeMetric(model)]
+    else:
+        metrics = [
+            StepCachingGEval(
+                name=name,
+                criteria=criteria,
+                evaluation_params=params,
+                model=model,
+            )
+            for name, criteria, params in CRITERIA
+        ]
+
+    if memoize:
+        return [MemoizedMetric(metric, model) for metric in metrics]
+    return metrics
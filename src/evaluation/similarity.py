@@ -0,0 +1,68 @@
+"""Near-duplicate detection for prompt templates with MinHash.
+
+Templates are normalised, split into word shingles and reduced to a
+fixed-size MinHash signature; the share of equal signature slots
+estimates the Jaccard similarity of the shingle sets. Signatures are
+cheap to store and compare, so every new candidate can be checked
+against every prompt of the run.
+"""
+
+import hashlib
+import random
+import re
+from typing import List, Sequence, Set
+
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 64
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def normalize_template(template: str) -> str:
+    """Canonical form of a template for duplicate detection.
+
+    Case, whitespace and punctuation are ignored; the ``{placeholders}``
+    are kept.
+    """
+
+    text = re.sub(r"[^\w{}]+", " ", template.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Word ``size``-grams of the normalised text."""
+
+    words = normalize_template(text).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {
+        " ".join(words[i:i + size]) for i in range(len(words) - size + 1)
+    }
+
+
+def minhash(text: str) -> List[int]:
+    """MinHash signature of the text's shingle set."""
+
+    hashes = [
+        int.from_bytes(
+            hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        for s in shingles(text)
+    ]
+    if not hashes:
+        return [_MERSENNE_PRIME] * NUM_PERMUTATIONS
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
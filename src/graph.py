@@ -1,48 +1,110 @@
 """LangGraph orchestration: wires the four agents into a cyclic graph."""
 
+from typing import List
+
 from langgraph.graph import END, START, StateGraph
+from langgraph.types import Send
 
+from .agents.admission import admission_node
+from .agents.comparison import model_evaluator_node, model_selector_node
 from .agents.evaluator import evaluator_node
 from .agents.feedback import feedback_node
+from .agents.pipeline import pipeline_node
 from .agents.runner import runner_node
 from .agents.suggester import suggester_node
+from .llm import stage_model
 from .state import OrchestratorState
 
 
 def _should_continue(state: OrchestratorState) -> str:
-    """Return 'continue' while below max_iterations, else 'end'."""
+    """Return 'continue' while below max_iterations and not converged."""
     if state["iteration"] >= state["max_iterations"]:
         return "end"
+    if state.get("stop_reason"):
+        return "end"
     return "continue"
 
 
-def build_graph():
+def _fan_out_models(state: OrchestratorState) -> List[Send]:
+    """One model_evaluator branch per model in ``comparison_models``.
+
+    The judge is resolved once from the parent state, so every candidate
+    is scored by the same judge instead of judging its own outputs.
+    """
+    judge_model = stage_model(state, "judge_model")
+    return [
+        Send(
+            "model_evaluator",
+            {**state, "model_name": model, "judge_model": judge_model},
+        )
+        for model in state["comparison_models"]
+    ]
+
+
+def build_graph(
+    pipelined: bool = False, checkpointer=None, compare_models: bool = False
+):
     """Build and compile the 4-agent orchestration graph.
 
     Flow:
-        START -> evaluator -> feedback -> suggester -> runner -+-> evaluator
+        START -> evaluator -> feedback -> suggester -> admission -> runner
+        runner -+-> evaluator
+                +-> END
+
+    With ``pipelined=True`` the evaluator and feedback agents run as a
+    single streaming stage, so reviews overlap with generation:
+        START -> pipeline -> suggester -> admission -> runner -+-> pipeline
                                                                +-> END
+
+    With ``compare_models=True`` the graph instead evaluates the initial
+    prompts once per model in ``comparison_models``, concurrently, and
+    picks the cheapest model that meets ``target_score``:
+        START =+=> model_evaluator (one per model) -> model_selector -> END
+
+    With a ``checkpointer`` (see ``checkpoint.get_checkpointer``) the state
+    is saved after every node, so a run invoked again with the same
+    ``thread_id`` and ``None`` as input resumes where it stopped.
     """
 
     builder = StateGraph(OrchestratorState)
 
+    if compare_models:
+        builder.add_node("model_evaluator", model_evaluator_node)
+        builder.add_node("model_selector", model_selector_node)
+        builder.add_conditional_edges(
+            START, _fan_out_models, ["model_evaluator"]
+        )
+        builder.add_edge("model_evaluator", "model_selector")
+        builder.add_edge("model_selector", END)
+        return builder.compile(checkpointer=checkpointer)
+
     # Nodes
-    builder.add_node("evaluator", evaluator_node)
-    builder.add_node("feedback", feedback_node)
+    if pipelined:
+        builder.add_node("pipeline", pipeline_node)
+        first_node = "pipeline"
+    else:
+        builder.add_node("evaluator", evaluator_node)
+        builder.add_node("feedback", feedback_node)
+        first_node = "evaluator"
     builder.add_node("suggester", suggester_node)
+    builder.add_node("admission", admission_node)
     builder.add_node("runner", runner_node)
 
     # Edges
-    builder.add_edge(START, "evaluator")
-    builder.add_edge("evaluator", "feedback")
-    builder.add_edge("feedback", "suggester")
-    builder.add_edge("suggester", "runner")
+    builder.add_edge(START, first_node)
+    if pipelined:
+        builder.add_edge("pipeline", "suggester")
+    else:
+        builder.add_edge("evaluator", "feedback")
+        builder.add_edge("feedback", "suggester")
+    builder.add_edge("suggester", "admission")
+    builder.add_edge("admission", "runner")
 
     # Conditional loop
     builder.add_conditional_edges(
         "runner",
         _should_continue,
-        {"continue": "evaluator", "end": END},
+        {"continue": first_node, "end": END},
     )
 
-    return builder.compile()
+    return builder.compile(checkpointer=checkpointer)
@@ -0,0 +1,140 @@
+"""Bounded iteration history: in-state aggregates plus an on-disk spill.
+
+Full iteration snapshots (prompts, every evaluation and feedback) grow with
+catalog size and iteration count. The graph state keeps aggregates for
+every iteration and full snapshots only for the most recent ones; every
+full snapshot is also appended to a per-run JSONL file that the UI can
+page through lazily.
+
+Configuration (environment variables):
+    HISTORY_DIR   directory of the per-run files (default: .cache/history)
+"""
+
+import json
+import os
+import threading
+from itertools import islice
+from typing import Any, Dict, Iterator, List
+
+DEFAULT_HISTORY_DIR = ".cache/history"
+MAX_LOG_LINES = 5000
+
+_lock = threading.Lock()
+
+
+def summarize_iteration(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Aggregates one full history entry into a compact summary.
+
+    Per prompt: average score and per-metric averages. Per iteration:
+    simulated feedback totals. A prompt pruned by racing is summarized
+    from its partial results and flagged ``partial``.
+    """
+
+    evaluations = entry.get("evaluations", [])
+    prompt_summaries: List[Dict[str, Any]] = []
+    for p in entry.get("prompts_used", []):
+        evals = [e for e in evaluations if e["prompt_id"] == p["id"]]
+        full = [e for e in evals if not e.get("partial")]
+        partial = bool(evals) and not full
+        evals = full or evals
+        metric_avgs: Dict[str, float] = {}
+        if evals and evals[0].get("metrics"):
+            for m_name in evals[0]["metrics"]:
+                vals = [
+                    e["metrics"][m_name]["score"]
+                    for e in evals
+                    if m_name in e.get("metrics", {})
+                ]
+                metric_avgs[m_name] = sum(vals) / len(vals) if vals else 0
+        prompt_summaries.append(
+            {
+                "id": p["id"],
+                "name": p["name"],
+                "rationale": p.get("rationale", ""),
+                "template": p.get("template", ""),
+                "avg_score": (
+                    sum(e["avg_score"] for e in evals) / len(evals)
+                    if evals
+                    else None
+                ),
+                "metrics": metric_avgs,
+                "partial": partial,
+            }
+        )
+
+    feedback = entry.get("feedback", [])
+    return {
+        "iteration": entry["iteration"],
+        "best_score": entry.get("best_score", 0.0),
+        "prompt_summaries": prompt_summaries,
+        "feedback_totals": {
+            "avaliacoes": len(feedback),
+            "positivos": sum(fb.get("positivos", 0) for fb in feedback),
+            "negativos": sum(fb.get("negativos", 0) for fb in feedback),
+        },
+    }
+
+
+def compact_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Drops the full snapshot of a history entry, keeping aggregates."""
+
+    return {
+        "iteration": entry["iteration"],
+        "best_score": entry.get("best_score", 0.0),
+        "summary": entry.get("summary") or summarize_iteration(entry),
+        "compacted": True,
+    }
+
+
+def merge_by_iteration(
+    left: List[Dict[str, Any]], right: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """State reducer: upserts entries by their ``iteration`` key.
+
+    New iterations are appended; an entry for an existing iteration
+    replaces it (this is how old snapshots get compacted in place).
+    """
+
+    merged = {e["iteration"]: e for e in left or []}
+    for entry in right or []:
+        merged[entry["iteration"]] = entry
+    return [merged[k] for k in sorted(merged)]
+
+
+def keep_recent_logs(left: List[str], right: List[str]) -> List[str]:
+    """State reducer: appends log lines, keeping the last MAX_LOG_LINES."""
+
+    return ((left or []) + (right or []))[-MAX_LOG_LINES:]
+
+
+class HistoryStore:
+    """Append-only JSONL file with one full snapshot per iteration."""
+
+    def __init__(self, run_id: str, directory: str = "") -> None:
+        directory = directory or os.getenv("HISTORY_DIR", DEFAULT_HISTORY_DIR)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{run_id}.jsonl")
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False)
+        with _lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def count(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding="utf-8") as f:
+            return sum(1 for _ in f)
+
+    def iter_entries(self) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def read_page(self, page: int, page_size: int) -> List[Dict[str, Any]]:
+        """Returns entries ``[page * page_size, (page + 1) * page_size)``."""
+
+        start = page * page_size
+        return list(islice(self.iter_entries(), start, start + page_size))
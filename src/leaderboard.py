@@ -0,0 +1,142 @@
+"""Elitist leaderboard: the best prompts found so far, with their scores.
+
+Each entry keeps a prompt and, for every product it was already scored
+on, a compact score record keyed by product ID: the iteration that scored
+it, the average and the per-metric scores. The leaderboard lives in the
+(checkpointed) graph state, so full results are not copied into it; they
+are read back from the run's history file when reused. The runner carries
+the elite prompts into the next iteration, and the evaluator reuses these
+results instead of calling the LLM again; it scores an elite prompt only
+on products it has not seen yet.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def entry_score(entry: Dict[str, Any]) -> float:
+    """Average score of a leaderboard entry over all its products."""
+
+    results = entry["results"].values()
+    return sum(r["avg_score"] for r in results) / len(results)
+
+
+def compact_result(result: Dict[str, Any], iteration: int) -> Dict[str, Any]:
+    """Score record of one result, pointing at the history ``iteration``
+    that holds the full result."""
+
+    return {
+        "iteration": iteration,
+        "avg_score": result["avg_score"],
+        "metrics": {
+            name: data["score"] for name, data in result["metrics"].items()
+        },
+    }
+
+
+def update_leaderboard(
+    leaderboard: List[Dict[str, Any]],
+    prompts: List[Dict[str, Any]],
+    evaluation_results: List[Dict[str, Any]],
+    size: int,
+    iteration: int,
+) -> List[Dict[str, Any]]:
+    """Merges the results of history ``iteration`` into the leaderboard
+    and keeps the ``size`` best entries.
+
+    Results of an elite prompt on new products are added to its entry.
+    Partial results of prompts pruned by racing are ignored, and reused
+    results keep pointing at the iteration that first scored them.
+    """
+
+    entries = {e["prompt"]["id"]: e for e in leaderboard}
+    by_prompt: Dict[str, Dict[str, Any]] = {}
+    for r in evaluation_results:
+        if not r.get("partial") and not r.get("reused"):
+            by_prompt.setdefault(r["prompt_id"], {})[r["product_id"]] = (
+                compact_result(r, iteration)
+            )
+
+    for prompt in prompts:
+        results = by_prompt.get(prompt["id"])
+        if not results:
+            continue
+        previous = entries.get(prompt["id"])
+        if previous is not None and (
+            previous["prompt"]["template"] == prompt["template"]
+        ):
+            results = {**previous["results"], **results}
+        entries[prompt["id"]] = {
+            "prompt": {
+                key: prompt[key]
+                for key in ("id", "name", "template", "rationale")
+                if key in prompt
+            },
+            "results": results,
+        }
+
+    for entry in entries.values():
+        entry["score"] = entry_score(entry)
+    return sorted(entries.values(), key=entry_score, reverse=True)[:size]
+
+
+def load_elite_results(
+    leaderboard: List[Dict[str, Any]],
+    history_entries: Iterable[Dict[str, Any]],
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Reads the full results of the leaderboard back from the history.
+
+    ``history_entries`` are the run's full iteration snapshots (see
+    ``HistoryStore.iter_entries``), scanned once. Returns the results
+    keyed by (prompt ID, product ID).
+    """
+
+    wanted = {
+        (record["iteration"], entry["prompt"]["id"], product_id)
+        for entry in leaderboard
+        for product_id, record in entry["results"].items()
+    }
+    iterations = {iteration for iteration, _, _ in wanted}
+    full: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for history_entry in history_entries:
+        if history_entry["iteration"] not in iterations:
+            continue
+        for r in history_entry.get("evaluations", []):
+            key = (history_entry["iteration"], r["prompt_id"], r["product_id"])
+            if key in wanted:
+                full[(r["prompt_id"], r["product_id"])] = r
+    return full
+
+
+def elite_result(
+    leaderboard: List[Dict[str, Any]],
+    full_results: Dict[Tuple[str, str], Dict[str, Any]],
+    prompt: Dict[str, Any],
+    product_id: str,
+) -> Optional[Dict[str, Any]]:
+    """Returns the stored result of ``prompt`` on a product, if any.
+
+    ``full_results`` come from ``load_elite_results``; a result missing
+    from the history is not reused, so the pair is scored again. The
+    returned copy is flagged ``reused`` and spends no tokens, so it is not
+    paid for (or reviewed) twice.
+    """
+
+    for entry in leaderboard:
+        if (
+            entry["prompt"]["id"] == prompt["id"]
+            and entry["prompt"]["template"] == prompt["template"]
+            and product_id in entry["results"]
+        ):
+            result = full_results.get((prompt["id"], product_id))
+            if result is None:
+                return None
+            return {
+                **result,
+                "tokens": 0,
+                "output_tokens": 0,
+                "judge_tokens": 0,
+                "generation_seconds": None,
+                "judge_seconds": None,
+                "reused": True,
+            }
+    return None
@@ -0,0 +1,122 @@
+"""Process-wide registry of chat models sharing pooled HTTP clients.
+
+Every agent node used to build its own ``ChatOpenAI`` and ``httpx.Client``
+per invocation, paying new TLS handshakes each iteration. Models are now
+created once per (model, temperature) and all of them share one sync and
+one async connection pool, so keep-alive connections are reused.
+
+Configuration (environment variables):
+    LLM_MAX_CONNECTIONS     total connections per pool (default: 100)
+    LLM_MAX_KEEPALIVE       idle keep-alive connections (default: 20)
+"""
+
+import src.ssl_config  # noqa: F401  — ensure SSL patch is active
+
+import os
+import threading
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+
+# USD per 1M tokens: (input, output)
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_models: Dict[Tuple[str, float, Optional[float], str], ChatOpenAI] = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(
+            os.getenv("LLM_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)
+        ),
+        max_keepalive_connections=int(
+            os.getenv("LLM_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE)
+        ),
+    )
+
+
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Returns the shared sync and async HTTP clients, creating them once."""
+
+    global _http_client, _async_http_client
+    with _lock:
+        if _http_client is None:
+            # verify=False mirrors src.ssl_config, which disables SSL
+            # verification for every HTTP client in the process.
+            _http_client = httpx.Client(verify=False, limits=_limits())
+            _async_http_client = httpx.AsyncClient(
+                verify=False, limits=_limits()
+            )
+        return _http_client, _async_http_client
+
+
+def get_chat_model(
+    model: str, temperature: float, timeout: Optional[float] = None
+) -> ChatOpenAI:
+    """Returns the shared ChatOpenAI for (model, temperature, timeout).
+
+    ``timeout`` (seconds per request) is set on the client itself, so it
+    also holds for wrapped runnables such as ``with_structured_output``,
+    which drop per-call invoke kwargs. The API key is part of the registry
+    key so that a key entered later in the UI is not shadowed by a model
+    built with an older one.
+    """
+
+    http_client, async_http_client = get_http_clients()
+    key = (model, temperature, timeout, os.getenv("OPENAI_API_KEY", ""))
+    with _lock:
+        if key not in _models:
+            _models[key] = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                timeout=timeout,
+                http_client=http_client,
+                http_async_client=async_http_client,
+            )
+        return _models[key]
+
+
+def stage_model(state: Mapping[str, Any], key: str) -> str:
+    """Returns the model configured for a stage (``judge_model``,
+    ``feedback_model``, ...), falling back to ``model_name``."""
+
+    return state.get(key) or state.get("model_name") or DEFAULT_MODEL
+
+
+def token_count(response: Any) -> int:
+    """Returns the total tokens reported for an LLM response, or 0."""
+
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+def token_usage(response: Any) -> Tuple[int, int]:
+    """Returns the (input, output) tokens reported for a response."""
+
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+
+def estimate_cost(
+    model: str, input_tokens: int, output_tokens: int
+) -> Optional[float]:
+    """Returns the USD cost of the given usage, or None for unpriced
+    models."""
+
+    if model not in MODEL_PRICES:
+        return None
+    input_price, output_price = MODEL_PRICES[model]
+    return (input_tokens * input_price + output_tokens * output_price) / 1e6
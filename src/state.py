@@ -3,24 +3,76 @@
 import operator
 from typing import Annotated, Any, Dict, List, TypedDict
 
+from .history_store import keep_recent_logs, merge_by_iteration
+
 
 class OrchestratorState(TypedDict):
     """State shared across all agents in the orchestration graph."""
 
-    # Input data
+    # Input data. Products are referenced by ID (resolved from the shared
+    # store in src/data/store.py) or streamed from a ``catalog`` spec; the
+    # full ``products`` list is still accepted for small ad-hoc runs.
+    product_ids: List[str]
     products: List[Dict[str, Any]]
+    catalog: Dict[str, Any]
     current_prompts: List[Dict[str, Any]]
-    model_name: str
+    model_name: str  # enrichment (generation) model
+    judge_model: str  # empty: same as model_name
+    feedback_model: str  # empty: same as model_name
+    suggester_model: str  # empty: same as model_name
     max_iterations: int
+    max_concurrency: int
+    use_cache: bool
+    feedback_timeout: float
+    enrichment_batch_size: int
+    combined_judge: bool
+    local_gate_threshold: float
+    racing: bool
+    racing_sample_size: int
+    racing_eta: int
+    pipelined: bool  # graph shape, needed to rebuild it on resume
+    comparison_models: List[str]  # non-empty: multi-model comparison run
+
+    # Token budget of the compact suggester context (0: full context)
+    suggester_context_tokens: int
+
+    # Retries of a feedback/suggester call whose response does not parse
+    parse_retries: int
+
+    # Population-based prompt search (population_size 0 disables)
+    population_size: int
+    population_parents: int
+    population_calls: int
+
+    # Near-duplicate suggestions at or above this MinHash similarity to a
+    # prompt already tried are not evaluated (0 disables)
+    admission_threshold: float
+
+    # Elitism: top-k prompts carried forward with their scores (0 disables)
+    elite_size: int
+    leaderboard: List[Dict[str, Any]]
+
+    # Stopping policy (0 disables a criterion)
+    target_score: float
+    min_delta: float
+    patience: int
+    token_budget: int
 
     # Agent outputs
     evaluation_results: List[Dict[str, Any]]
     suggestions: List[Dict[str, Any]]
     feedback_results: List[Dict[str, Any]]
+    model_results: Annotated[Dict[str, Dict[str, Any]], operator.or_]
+    selected_model: str
 
     # Tracking
     iteration: int
-    history: Annotated[List[Dict[str, Any]], operator.add]
-    feedback_history: Annotated[List[Dict[str, Any]], operator.add]
-    logs: Annotated[List[str], operator.add]
+    run_id: str
+    history_retention: int
+    history: Annotated[List[Dict[str, Any]], merge_by_iteration]
+    feedback_history: Annotated[List[Dict[str, Any]], merge_by_iteration]
+    logs: Annotated[List[str], keep_recent_logs]
+    tokens_used: Annotated[int, operator.add]
+    stage_timings: Annotated[List[Dict[str, Any]], operator.add]
+    stop_reason: str
     status: str
@@ -0,0 +1,201 @@
+"""Schema-constrained LLM responses for the agents and the combined judge.
+
+Calls go through ``with_structured_output`` (OpenAI JSON schema mode), so
+the model is constrained to the Pydantic schemas below. A response that
+still fails validation (truncated output, a refusal, a model without
+schema support) gets a cheap local repair pass; if that fails too, the
+call is retried up to ``parse_retries`` times before the caller falls
+back. Every call reports how its responses parsed, so the failure rate
+can be tracked per stage.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Literal, Tuple, Type, TypeVar
+
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, ValidationError, model_validator
+
+from .llm import token_count
+
+DEFAULT_PARSE_RETRIES = 1
+
+Schema = TypeVar("Schema", bound=BaseModel)
+
+
+class AttributeFeedback(BaseModel):
+    """Verdict of the simulated user on one generated attribute."""
+
+    atributo: str
+    valor_gerado: str
+    veredicto: Literal["positivo", "negativo"]
+    motivo: str
+
+
+class FeedbackReview(BaseModel):
+    """Simulated user review of one enriched output."""
+
+    total_atributos: int
+    positivos: int
+    negativos: int
+    feedbacks: List[AttributeFeedback]
+    comentario_geral: str
+
+
+class CriterionVerdict(BaseModel):
+    """Judge verdict on one criterion: a 0-10 score and its reason."""
+
+    score: float
+    reason: str
+
+
+class PromptSuggestion(BaseModel):
+    """One prompt variation proposed by the suggester."""
+
+    id: str
+    name: str
+    template: str
+    rationale: str
+
+
+class SuggestionList(BaseModel):
+    """Suggester response: the proposed prompt variations."""
+
+    suggestions: List[PromptSuggestion]
+
+    @model_validator(mode="before")
+    @classmethod
+    def _wrap_array(cls, data: Any) -> Any:
+        # Free-form responses follow the old bare-array format
+        if isinstance(data, list):
+            return {"suggestions": data}
+        return data
+
+
+class StructuredOutputError(ValueError):
+    """No response validated against the schema within the retries.
+
+    Carries the tokens spent and the parse outcome of the failed call.
+    """
+
+    def __init__(
+        self, message: str, tokens: int, outcome: Dict[str, int]
+    ) -> None:
+        super().__init__(message)
+        self.tokens = tokens
+        self.outcome = outcome
+
+
+def _close_truncated(text: str) -> str:
+    """Closes the strings, arrays and objects left open by a cut-off
+    response."""
+
+    closers: List[str] = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+    if in_string:
+        text += '"'
+    return text + "".join(reversed(closers))
+
+
+def repair_json(text: str) -> str:
+    """Cheap local fixes for almost-valid JSON.
+
+    Drops markdown fences and the prose around the JSON value, removes
+    trailing commas and closes a truncated value.
+    """
+
+    text = re.sub(r"```(?:json)?", "", text).strip()
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text
+    text = text[min(starts):]
+    end = max(text.rfind("}"), text.rfind("]")) + 1
+    if end:
+        text = text[:end]
+    return re.sub(r",\s*([}\]])", r"\1", _close_truncated(text))
+
+
+def _validate_repaired(raw: Any, schema: Type[Schema]) -> Schema:
+    content = getattr(raw, "content", "")
+    if not isinstance(content, str):
+        raise ValueError("Resposta sem texto para reparar")
+    return schema.model_validate(json.loads(repair_json(content)))
+
+
+def invoke_structured(
+    llm: ChatOpenAI,
+    messages: List[Dict[str, str]],
+    schema: Type[Schema],
+    retries: int = DEFAULT_PARSE_RETRIES,
+) -> Tuple[Schema, int, Dict[str, int]]:
+    """Invokes ``llm`` constrained to ``schema``.
+
+    The structured runnable does not forward invoke kwargs to the model,
+    so request options such as the timeout must be set on ``llm`` itself
+    (see ``get_chat_model``).
+
+    Returns the parsed response, the tokens spent over every attempt and
+    the parse outcome (``responses``, ``parse_failures``, ``repaired``,
+    ``fallbacks``). Raises StructuredOutputError when neither the response
+    nor its repair validates after ``retries`` retries; errors of the call
+    itself (timeouts, API errors) propagate unchanged.
+    """
+
+    structured = llm.with_structured_output(
+        schema, method="json_schema", include_raw=True
+    )
+    tokens = 0
+    outcome = parse_totals([])
+    error: Any = None
+    for _ in range(max(0, retries) + 1):
+        response = structured.invoke(messages)
+        tokens += token_count(response["raw"])
+        outcome["responses"] += 1
+        if response["parsed"] is not None:
+            return response["parsed"], tokens, outcome
+
+        outcome["parse_failures"] += 1
+        try:
+            parsed = _validate_repaired(response["raw"], schema)
+        except (ValueError, ValidationError) as e:
+            error = response.get("parsing_error") or e
+            continue
+        outcome["repaired"] += 1
+        return parsed, tokens, outcome
+
+    outcome["fallbacks"] += 1
+    raise StructuredOutputError(
+        f"Resposta fora do schema {schema.__name__} apos "
+        f"{outcome['responses']} tentativas: {error}",
+        tokens,
+        outcome,
+    )
+
+
+def parse_totals(outcomes: Iterable[Dict[str, int]]) -> Dict[str, int]:
+    """Sums the parse outcomes of a stage's calls."""
+
+    totals = {
+        "responses": 0,
+        "parse_failures": 0,
+        "repaired": 0,
+        "fallbacks": 0,
+    }
+    for outcome in outcomes:
+        for key in totals:
+            totals[key] += outcome.get(key, 0)
+    return totals
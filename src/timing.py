@@ -0,0 +1,56 @@
+"""Per-stage latency accounting for the agent nodes.
+
+Every node reports, per iteration, the model each of its stages used, how
+many LLM calls the stage made and the summed seconds of those calls. With
+concurrent calls this busy time exceeds wall-clock time; it is what the
+per-stage model settings change, so stages and models can be compared on
+latency as well as tokens.
+
+Stages that parse structured responses also report their parse outcome
+(responses, schema failures, local repairs and fallbacks).
+"""
+
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+
+def stage_timing(
+    iteration: int,
+    stage: str,
+    model: str,
+    latencies: Iterable[Optional[float]],
+    tokens: int = 0,
+    parse: Optional[Mapping[str, int]] = None,
+) -> Dict[str, Any]:
+    """Builds one ``stage_timings`` entry; None latencies are skipped.
+
+    ``parse`` holds the stage's summed parse outcome (see
+    ``src/structured_output.py``).
+    """
+
+    measured = [s for s in latencies if s is not None]
+    return {
+        "iteration": iteration + 1,
+        "stage": stage,
+        "model": model,
+        "calls": len(measured),
+        "seconds": sum(measured),
+        "tokens": tokens,
+        **(parse or {}),
+    }
+
+
+def timing_log(entry: Dict[str, Any]) -> str:
+    """One log line summarising a ``stage_timings`` entry."""
+
+    mean = entry["seconds"] / entry["calls"] if entry["calls"] else 0.0
+    line = (
+        f"Tempo {entry['stage']} ({entry['model']}): {entry['calls']} "
+        f"chamadas, {mean:.2f}s em media, {entry['seconds']:.1f}s no total"
+    )
+    if entry.get("responses"):
+        line += (
+            f" | parse: {entry['parse_failures']}/{entry['responses']} "
+            f"falhas, {entry['repaired']} reparadas, "
+            f"{entry['fallbacks']} fallbacks"
+        )
+    return line
@@ -0,0 +1,102 @@
+import json
+from types import SimpleNamespace
+
+from src.agents.evaluator import (
+    _build_enrichment_prompt,
+    _evaluate_pair,
+    _generate_batch,
+)
+from src.cache import DiskCache
+
+PROMPT = {
+    "id": "prompt_v1",
+    "name": "Basico",
+    "template": "Enriqueca {product_name} ({category}) {brand}: "
+    "{description} {attributes}",
+}
+
+
+def _product(name):
+    return {
+        "name": name,
+        "category": "Eletronicos",
+        "description": f"Descricao de {name}",
+        "brand": "Marca",
+        "attributes": {},
+        "expected_attributes": {"cor": "preto"},
+    }
+
+
+class FakeLLM:
+    model_name = "gpt-4o-mini"
+    temperature = 0.1
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return SimpleNamespace(
+            content=json.dumps(
+                {"1": {"cor": "preto"}, "2": {"cor": "branco"}}
+            ),
+            usage_metadata={
+                "input_tokens": 100,
+                "output_tokens": 40,
+                "total_tokens": 140,
+            },
+        )
+
+
+def test_batch_with_cached_item_reports_tuple_usage(tmp_path):
+    cache = DiskCache(
+        str(tmp_path / "cache.sqlite3"), "enrichment", 3600, 100
+    )
+    llm = FakeLLM()
+    products = [_product("A"), _product("B"), _product("C")]
+    # Product A is already cached; B and C go out in one batched call
+    cached_prompt = _build_enrichment_prompt(PROMPT["template"], products[0])
+    cache.set(
+        cache.make_key(llm.model_name, llm.temperature, cached_prompt),
+        '{"cor": "preto"}',
+    )
+
+    generations = _generate_batch(llm, PROMPT, products, cache=cache)
+
+    assert llm.calls == 1
+    # Batch outputs must not be reused by single-product generations
+    single_key = cache.make_key(
+        llm.model_name,
+        llm.temperature,
+        _build_enrichment_prompt(PROMPT["template"], products[1]),
+    )
+    assert cache.get(single_key) is None
+    assert generations[0][1] == (0, 0)
+    assert generations[0][2] is True
+    assert generations[1][1] == (50, 20)
+    for product, generation in zip(products, generations):
+        result, _, _ = _evaluate_pair(
+            llm,
+            [],
+            PROMPT,
+            product,
+            generation=generation,
+            local_gate=2.0,
+        )
+        assert result["tokens"] == sum(generation[1])
+        assert result["output_tokens"] == generation[1][1]
+
+
+def test_repeated_batch_reuses_its_own_outputs(tmp_path):
+    cache = DiskCache(
+        str(tmp_path / "cache.sqlite3"), "enrichment", 3600, 100
+    )
+    llm = FakeLLM()
+    products = [_product("A"), _product("B")]
+
+    first = _generate_batch(llm, PROMPT, products, cache=cache)
+    second = _generate_batch(llm, PROMPT, products, cache=cache)
+
+    assert llm.calls == 1
+    assert [g[0] for g in second] == [g[0] for g in first]
+    assert all(g[1] == (0, 0) and g[2] for g in second)
@@ -0,0 +1,54 @@
+import json
+
+import httpx
+
+from src import llm as llm_module
+from src.structured_output import SuggestionList, invoke_structured
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [
+        {
+            "index": 0,
+            "message": {
+                "role": "assistant",
+                "content": json.dumps({"suggestions": []}),
+            },
+            "finish_reason": "stop",
+        }
+    ],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8},
+}
+
+
+def test_timeout_reaches_the_http_client(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request.extensions["timeout"])
+        return httpx.Response(200, json=COMPLETION)
+
+    transport = httpx.MockTransport(handler)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(
+        llm_module, "_http_client", httpx.Client(transport=transport)
+    )
+    monkeypatch.setattr(
+        llm_module,
+        "_async_http_client",
+        httpx.AsyncClient(transport=transport),
+    )
+    monkeypatch.setattr(llm_module, "_models", {})
+
+    llm = llm_module.get_chat_model("gpt-4o-mini", 0.3, timeout=12.5)
+    parsed, tokens, outcome = invoke_structured(
+        llm, [{"role": "user", "content": "oi"}], SuggestionList
+    )
+
+    assert parsed.suggestions == []
+    assert tokens == 8
+    assert outcome["responses"] == 1
+    assert seen and seen[0]["read"] == 12.5